@@ -0,0 +1,418 @@
+"""HTTP負荷試験ハーネス.
+
+生成した課題データでアプリケーションをuvicornで起動し、同時接続数を段階的に増やしながら
+エンドポイントごとのレイテンシ(p50/p95/p99)、スループット、エラー率を計測する.
+ワーカー数・課題数・リポジトリの構成(リクエストごとにJSONを読む構成と、起動時に読み込む構成)
+の組み合わせごとに計測し、結果をJSONとCSVに書き出す::
+
+    python -m benchmarks.load_test --workers 1 2 4 8 --tasks 100 1000 10000 --modes json preload
+
+uvicornの `--workers` はワーカーをフォークではなくspawnで起動し、各ワーカーがファクトリを
+呼び出してアプリケーションを作り直す. そのため preload 構成でも、起動時に読み込んだ課題データは
+ワーカーごとに別々に保持され、フォーク前に読み込んだデータをコピーオンライトで共有する効果
+(gunicornの `--preload` で得られるもの)は計測に含まれない. preload 構成の結果は、
+読み込み済みのスナップショットから応答する場合のレイテンシとスループットとして扱うこと.
+
+クライアントも同じマシンのPythonで動くため、高い同時接続数ではクライアント側が
+先に飽和する場合がある. 比較は同じマシン・同じ設定の結果どうしで行うこと.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.task_memory import generate_task_data
+from main import create_app
+
+# 起動したサーバーに課題データのパスを渡す環境変数
+TASKS_FILE_ENV = "HARMONY_LOAD_TEST_TASKS_FILE"
+
+MODES = ("json", "preload")
+ENDPOINTS = ("list", "detail")
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+_STARTUP_TIMEOUT = 60.0
+
+
+def json_app() -> FastAPI:
+    """リクエストごとにJSONファイルを読む構成のアプリケーション(uvicornのファクトリ)."""
+    return create_app(Path(os.environ[TASKS_FILE_ENV]))
+
+
+def preload_app() -> FastAPI:
+    """課題一覧を起動時に読み込む構成のアプリケーション(uvicornのファクトリ).
+
+    uvicornはワーカーごとにファクトリを呼び出すため、課題一覧の読み込みもワーカーごとに行われる.
+    """
+    return create_app(Path(os.environ[TASKS_FILE_ENV]), preload=True)
+
+
+@dataclass(frozen=True)
+class LevelResult:
+    """1つの同時接続数での計測結果.
+
+    Attributes:
+        mode (str): リポジトリの構成.
+        workers (int): uvicornのワーカー数.
+        tasks (int): 課題数.
+        endpoint (str): 計測したエンドポイント.
+        concurrency (int): 同時接続数.
+        requests (int): 完了したリクエスト数.
+        errors (int): 失敗したリクエスト数(例外またはステータス400以上).
+        error_rate (float): エラー率.
+        throughput (float): 1秒あたりの完了リクエスト数.
+        p50_ms (float): レイテンシの中央値(ミリ秒).
+        p95_ms (float): レイテンシの95パーセンタイル(ミリ秒).
+        p99_ms (float): レイテンシの99パーセンタイル(ミリ秒).
+
+    """
+
+    mode: str
+    workers: int
+    tasks: int
+    endpoint: str
+    concurrency: int
+    requests: int
+    errors: int
+    error_rate: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """昇順に並んだ値のパーセンタイルを最近傍順位法で求める.
+
+    Args:
+        sorted_values: 昇順に並んだ値.
+        q: パーセンタイル(0から100).
+
+    Returns:
+        float: パーセンタイル. 値が無い場合はNaN.
+
+    """
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[min(int(rank), len(sorted_values)) - 1]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    paths: Sequence[str],
+    concurrency: int,
+    duration: float,
+) -> tuple[list[float], int, float]:
+    """指定した同時接続数で一定時間リクエストを送り続ける.
+
+    各接続は前のレスポンスを受け取ってから次のリクエストを送る(クローズドループ).
+
+    Args:
+        client: HTTPクライアント.
+        paths: リクエストするパス. 接続ごとにランダムに選ぶ.
+        concurrency: 同時接続数.
+        duration: 計測時間(秒).
+
+    Returns:
+        tuple[list[float], int, float]: 成功したリクエストのレイテンシ(秒)、失敗数、実際の経過時間(秒).
+
+    """
+    latencies: list[float] = []
+    errors = 0
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def connection(seed: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed)  # noqa: S311
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            try:
+                response = await client.get(rng.choice(paths))
+                await response.aread()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code >= httpx.codes.BAD_REQUEST:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - sent)
+
+    await asyncio.gather(*(connection(seed) for seed in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def summarize(  # noqa: PLR0913
+    latencies: list[float],
+    errors: int,
+    elapsed: float,
+    *,
+    mode: str,
+    workers: int,
+    tasks: int,
+    endpoint: str,
+    concurrency: int,
+) -> LevelResult:
+    """1つの同時接続数での計測値を集計する.
+
+    Args:
+        latencies: 成功したリクエストのレイテンシ(秒).
+        errors: 失敗したリクエスト数.
+        elapsed: 経過時間(秒).
+        mode: リポジトリの構成.
+        workers: uvicornのワーカー数.
+        tasks: 課題数.
+        endpoint: 計測したエンドポイント.
+        concurrency: 同時接続数.
+
+    Returns:
+        LevelResult: 集計結果.
+
+    """
+    latencies = sorted(latencies)
+    requests = len(latencies) + errors
+    return LevelResult(
+        mode=mode,
+        workers=workers,
+        tasks=tasks,
+        endpoint=endpoint,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        error_rate=errors / requests if requests else 0.0,
+        throughput=requests / elapsed if elapsed > 0 else 0.0,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p95_ms=percentile(latencies, 95) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+    )
+
+
+def write_tasks_file(directory: Path, count: int) -> Path:
+    """生成した課題データをリポジトリの形式で書き出す.
+
+    Args:
+        directory: 書き出すディレクトリ.
+        count: 課題数.
+
+    Returns:
+        Path: 課題データのJSONファイルのパス.
+
+    """
+    path = directory / f"tasks-{count}" / "tasks.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {"tasks": generate_task_data(count), "metadata": {"version": "1.0", "totalTasks": count}}
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _free_port() -> int:
+    """空いているTCPポートを取得する."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(tasks_file: Path, mode: str, workers: int) -> Iterator[str]:
+    """アプリケーションをuvicornの別プロセスで起動し、応答可能になるまで待つ.
+
+    ワーカーはspawnで起動されるため、マスタープロセスで読み込んだデータは共有されない.
+
+    Args:
+        tasks_file: 課題データのJSONファイルのパス.
+        mode: リポジトリの構成.
+        workers: uvicornのワーカー数.
+
+    Yields:
+        str: サーバーのベースURL.
+
+    Raises:
+        RuntimeError: サーバーが時間内に起動しなかった場合.
+
+    """
+    port = _free_port()
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        f"benchmarks.load_test:{mode}_app",
+        "--factory",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    env = {**os.environ, TASKS_FILE_ENV: str(tasks_file)}
+    process = subprocess.Popen(command, cwd=_BACKEND_DIR, env=env)  # noqa: S603
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + _STARTUP_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                msg = f"Server exited with status {process.returncode}"
+                raise RuntimeError(msg)
+            try:
+                if httpx.get(f"{base_url}/api/tasks:batchGet?ids=task-000000").is_success:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                msg = "Server did not start in time"
+                raise RuntimeError(msg)
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def measure_server(  # noqa: PLR0913
+    base_url: str,
+    *,
+    task_ids: Sequence[str],
+    endpoints: Sequence[str],
+    concurrency_levels: Sequence[int],
+    duration: float,
+    warmup: float,
+    mode: str,
+    workers: int,
+    tasks: int,
+) -> list[LevelResult]:
+    """起動済みのサーバーに対して、エンドポイントごとに同時接続数を増やしながら計測する.
+
+    Args:
+        base_url: サーバーのベースURL.
+        task_ids: 課題詳細のリクエストに用いる課題ID.
+        endpoints: 計測するエンドポイント.
+        concurrency_levels: 同時接続数の段階.
+        duration: 各段階の計測時間(秒).
+        warmup: 各エンドポイントの計測前に、最大の同時接続数で負荷をかける時間(秒).
+            全てのワーカーの起動と索引の構築を待つために用いる.
+        mode: リポジトリの構成.
+        workers: uvicornのワーカー数.
+        tasks: 課題数.
+
+    Returns:
+        list[LevelResult]: 段階ごとの計測結果.
+
+    """
+    paths = {"list": ["/api/tasks"], "detail": [f"/api/tasks/{task_id}" for task_id in task_ids]}
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        for endpoint in endpoints:
+            await run_level(client, paths[endpoint], max(concurrency_levels), warmup)
+            for concurrency in concurrency_levels:
+                latencies, errors, elapsed = await run_level(client, paths[endpoint], concurrency, duration)
+                result = summarize(
+                    latencies,
+                    errors,
+                    elapsed,
+                    mode=mode,
+                    workers=workers,
+                    tasks=tasks,
+                    endpoint=endpoint,
+                    concurrency=concurrency,
+                )
+                print(
+                    f"{result.mode:>8} workers={result.workers:<2} tasks={result.tasks:<6} "
+                    f"{endpoint:<6} c={concurrency:<4} {result.throughput:9.1f} req/s "
+                    f"p50={result.p50_ms:7.1f}ms p95={result.p95_ms:7.1f}ms p99={result.p99_ms:7.1f}ms "
+                    f"errors={result.error_rate:.1%}",
+                    flush=True,
+                )
+                results.append(result)
+    return results
+
+
+def write_results(results: Sequence[LevelResult], output: Path) -> None:
+    """計測結果をJSONとCSVに書き出す.
+
+    Args:
+        results: 計測結果.
+        output: 拡張子を除いた出力先のパス.
+
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    rows = [asdict(result) for result in results]
+    output.with_suffix(".json").write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    with output.with_suffix(".csv").open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(LevelResult.__dataclass_fields__))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> None:
+    """コマンドラインから負荷試験を実行する."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="uvicornのワーカー数")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[100, 1_000, 10_000], help="課題数")
+    parser.add_argument("--modes", choices=MODES, nargs="+", default=list(MODES), help="リポジトリの構成")
+    parser.add_argument("--endpoints", choices=ENDPOINTS, nargs="+", default=list(ENDPOINTS), help="エンドポイント")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32, 64],
+        help="同時接続数の段階",
+    )
+    parser.add_argument("--duration", type=float, default=5.0, help="各段階の計測時間(秒)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="計測前に負荷をかける時間(秒)")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=_BACKEND_DIR / "benchmarks" / "results" / "load_test",
+        help="拡張子を除いた出力先のパス. .jsonと.csvを書き出す",
+    )
+    args = parser.parse_args()
+
+    results: list[LevelResult] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.tasks:
+            tasks_file = write_tasks_file(Path(tmp), count)
+            task_ids = [f"task-{i:06d}" for i in range(count)]
+            for mode in args.modes:
+                for workers in args.workers:
+                    with serve(tasks_file, mode, workers) as base_url:
+                        results += asyncio.run(
+                            measure_server(
+                                base_url,
+                                task_ids=task_ids,
+                                endpoints=args.endpoints,
+                                concurrency_levels=args.concurrency,
+                                duration=args.duration,
+                                warmup=args.warmup,
+                                mode=mode,
+                                workers=workers,
+                                tasks=count,
+                            ),
+                        )
+    write_results(results, args.output)
+    print(f"Wrote {args.output.with_suffix('.json')} and {args.output.with_suffix('.csv')}")
+
+
+if __name__ == "__main__":
+    main()
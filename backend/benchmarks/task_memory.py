@@ -0,0 +1,116 @@
+"""和声課題1件あたりのメモリ使用量を計測するベンチマーク.
+
+生成した課題データを `HarmonyTask` のリストとして保持した場合と、`CompactTaskStore`
+に保持した場合とで、tracemallocで計測したメモリ使用量を比較する::
+
+    python -m benchmarks.task_memory --tasks 10000
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from collections.abc import Callable, Iterable
+
+from models.harmony_task_model import HarmonyTask
+from repositories.compact_task_store import CompactTaskStore
+
+_TAGS = ("バス課題", "ソプラノ課題", "バッハコラール", "機能和声", "転調", "半音階", "四声体", "初級", "上級")
+_NOTES = ("C3", "D3", "E3", "F3", "G3", "A3", "B3", "C4")
+
+
+def generate_task_data(count: int, seed: int = 0) -> list[dict]:
+    """計測用の課題データを生成する.
+
+    Args:
+        count: 課題の数.
+        seed: 乱数のシード.
+
+    Returns:
+        list[dict]: `HarmonyTask` に変換できる課題データ.
+
+    """
+    rng = random.Random(seed)  # noqa: S311
+    data = []
+    for i in range(count):
+        notes = [rng.choice(_NOTES) for _ in range(rng.randint(4, 16))]
+        data.append(
+            {
+                "id": f"task-{i:06d}",
+                "title": f"和声課題 No.{i}",
+                "description": "与えられたバス声部に上三声を付け、禁則に注意して四声体を完成させてください。",
+                "score": {"type": "json", "data": json.dumps({"key": 0, "mode": "major", "notes": notes})},
+                "answer": [{"type": "musicxml", "data": f"answers/task_{i:06d}_answer.musicxml"}],
+                "difficulty": rng.choice(("easy", "normal", "hard")),
+                "tags": rng.sample(_TAGS, rng.randint(1, 3)),
+            },
+        )
+    return data
+
+
+def measure(build: Callable[[], object]) -> int:
+    """構築した構造が保持しているメモリのバイト数を計測する.
+
+    Args:
+        build: 計測対象の構造を構築する関数.
+
+    Returns:
+        int: 構築後に確保されたままのバイト数.
+
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def run(count: int) -> dict[str, float]:
+    """課題1件あたりのメモリ使用量を計測する.
+
+    Args:
+        count: 課題の数.
+
+    Returns:
+        dict[str, float]: 表現ごとの課題1件あたりのバイト数.
+
+    """
+    data = generate_task_data(count)
+
+    def validated() -> Iterable[HarmonyTask]:
+        return (HarmonyTask.model_validate(item) for item in data)
+
+    models = measure(lambda: list(validated()))
+    compact = measure(lambda: CompactTaskStore(validated()))
+    return {"tasks": count, "harmony_task": models / count, "compact_task_store": compact / count}
+
+
+def main() -> None:
+    """コマンドラインから計測を実行する."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1_000, 10_000], help="課題の数")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力する")
+    args = parser.parse_args()
+
+    results = [run(count) for count in args.tasks]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'tasks':>8} {'HarmonyTask':>14} {'CompactTaskStore':>18} {'ratio':>7}")
+    for result in results:
+        ratio = result["compact_task_store"] / result["harmony_task"]
+        print(
+            f"{result['tasks']:>8} {result['harmony_task']:>12.0f} B "
+            f"{result['compact_task_store']:>16.0f} B {ratio:>7.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
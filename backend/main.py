@@ -1,45 +1,163 @@
 """アプリケーションのエントリーポイント.
 
 FastAPIアプリケーションのインスタンスと設定を提供する.
+
+フォーク型のマルチワーカー構成(gunicorn の `--preload` など)では、アプリケーション
+ファクトリを `preload=True` で呼び出すと、マスタープロセスで課題一覧の読み込みと
+索引の構築を済ませてからフォークするため、各ワーカーはメモリページを共有し、
+起動直後からリクエストを処理できる::
+
+    gunicorn --preload -k uvicorn.workers.UvicornWorker -w 4 "main:create_app(preload=True)"
+
+課題データを更新した後は、ワーカーに `SIGUSR2` を送ると課題一覧と索引を読み込み直す.
+別のワーカーが課題を保存した場合は、次のリクエストで課題データの更新を検知して読み込み直す.
 """
 
+import asyncio
+import gc
+import logging
+import signal
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from repositories.harmony_task_repository import HarmonyTaskRepository, PersistenceError
+from repositories.preloaded_harmony_task_repository import PreloadedHarmonyTaskRepository
 from routes import tasks
 
 # データファイルのパス設定
 TASKS_FILE = Path(__file__).parent / "data" / "tasks.json"
 
-# FastAPIアプリケーションの作成
-app = FastAPI()
+# ワーカーに課題一覧の読み込み直しを指示するシグナル. Windowsには存在しない
+RELOAD_SIGNAL = getattr(signal, "SIGUSR2", None)
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(repository: HarmonyTaskRepository) -> None:
+    """索引を事前に構築し、最初のリクエストから索引を利用できるようにする.
+
+    構築に失敗してもアプリケーションの起動は妨げず、エラーを記録して最初のリクエストでの
+    構築に任せる.
+
+    Args:
+        repository: 索引の元となるリポジトリ.
+
+    """
+    for cache in (tasks.melodic_index_cache, tasks.similarity_index_cache):
+        try:
+            cache.get(repository)
+        except Exception:
+            logger.exception("Failed to warm up the task index")
+
+
+def reload_catalogue(repository: PreloadedHarmonyTaskRepository) -> None:
+    """課題一覧を読み込み直し、索引を構築し直す.
+
+    読み込みに失敗した場合はエラーを記録し、読み込み済みの課題一覧を使い続ける.
+
+    Args:
+        repository: 読み込み直すリポジトリ.
+
+    """
+    try:
+        repository.reload()
+    except PersistenceError:
+        logger.exception("Failed to reload the task catalogue")
+        return
+    warm_up(repository)
+
+
+def _install_reload_signal(repository: PreloadedHarmonyTaskRepository) -> None:
+    """ワーカーのイベントループに読み込み直しのシグナルハンドラを登録する."""
+    if RELOAD_SIGNAL is None:
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(
+            RELOAD_SIGNAL,
+            lambda: loop.run_in_executor(None, reload_catalogue, repository),
+        )
+    except (NotImplementedError, RuntimeError):
+        # シグナルハンドラを登録できない環境(メインスレッド以外など)では読み込み直しを無効にする
+        return
+
+
+def create_app(tasks_file: Path = TASKS_FILE, *, preload: bool = False) -> FastAPI:
+    """FastAPIアプリケーションを作成する.
+
+    Args:
+        tasks_file: 課題データのJSONファイルのパス.
+        preload: Trueの場合、課題一覧を読み込んで索引を構築し、`gc.freeze()` で
+            ガベージコレクタの追跡対象から外した状態でアプリケーションを返す.
+            フォーク前のマスタープロセスで呼び出すことを想定する.
+
+    Returns:
+        FastAPI: アプリケーション.
+
+    """
+    preloaded: PreloadedHarmonyTaskRepository | None = None
+    if preload:
+        try:
+            preloaded = PreloadedHarmonyTaskRepository(tasks.JsonHarmonyTaskRepository(str(tasks_file)))
+        except PersistenceError:
+            # 読み込めない場合はリクエストごとにJSONファイルを読む構成で起動する
+            logger.exception("Failed to preload the task catalogue")
+        else:
+            tasks.attach_index_caches(preloaded)
+            warm_up(preloaded)
+            # 読み込み済みのオブジェクトをGCの走査対象から外し、フォーク後のページ複製を抑える
+            gc.collect()
+            gc.freeze()
+
+    def create_repository() -> HarmonyTaskRepository:
+        """タスクリポジトリを作成する."""
+        if preloaded is not None:
+            # 別のワーカーによる変更があれば、スナップショットを読み込み直してから応答する
+            try:
+                preloaded.refresh()
+            except PersistenceError:
+                logger.exception("Failed to refresh the task catalogue")
+            return preloaded
+        return tasks.attach_index_caches(tasks.JsonHarmonyTaskRepository(str(tasks_file)))
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        """ワーカー起動時の処理."""
+        if preloaded is None:
+            warm_up(create_repository())
+        else:
+            _install_reload_signal(preloaded)
+        yield
 
-# CORS設定
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # フロントエンドのオリジン
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # FastAPIアプリケーションの作成
+    app = FastAPI(lifespan=lifespan)
 
-# ルーターの登録
-app.include_router(
-    tasks.router,
-    prefix="/api",
-    tags=["tasks"],
-)
+    # CORS設定
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # フロントエンドのオリジン
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
+    # ルーターの登録
+    app.include_router(
+        tasks.router,
+        prefix="/api",
+        tags=["tasks"],
+    )
 
-# 依存性の注入
-def create_repository() -> tasks.JsonHarmonyTaskRepository:
-    """タスクリポジトリを作成する."""
-    return tasks.JsonHarmonyTaskRepository(str(TASKS_FILE))
+    # 依存性の注入
+    app.dependency_overrides[tasks.get_repository] = create_repository
+    return app
 
 
-app.dependency_overrides[tasks.get_repository] = create_repository
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,34 @@
+"""TaskChangeモデル定義モジュール.
+
+和声課題の変更履歴(変更フィード)のデータモデルを提供する.
+"""
+
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+from models.harmony_task_model import HarmonyTask
+
+
+class TaskChangeType(str, Enum):
+    """変更の種類."""
+
+    saved = "saved"
+    deleted = "deleted"
+
+
+class TaskChange(BaseModel):
+    """和声課題の変更1件分のデータモデル.
+
+    Attributes:
+        sequence (int): 変更ごとに単調増加する通し番号.
+        type (TaskChangeType): 変更の種類.
+        task_id (str): 変更された課題のID.
+        task (HarmonyTask | None): 保存された課題の現在の内容. 削除された場合はNone.
+
+    """
+
+    sequence: int = Field(..., ge=1, description="変更ごとに単調増加する通し番号")
+    type: TaskChangeType = Field(..., description="変更の種類")
+    task_id: str = Field(..., description="変更された課題のID")
+    task: HarmonyTask | None = Field(None, description="保存された課題の現在の内容")
@@ -0,0 +1,175 @@
+"""大量の和声課題を省メモリで保持するストア.
+
+課題ごとに `HarmonyTask` を保持すると、Pydanticモデルの辞書やタグ文字列のリストが
+課題の数だけ作られる. このストアでは、説明文や譜例データなどの本文を1つの共有バッファに
+連結してオフセットで参照し、タグは整数IDに、難易度は1バイトの符号に置き換える.
+`HarmonyTask` はAPIに返す時点で初めて組み立てる.
+"""
+
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+
+from models.harmony_task_model import Answer, AnswerType, Difficulty, HarmonyTask, Score, ScoreType
+
+# 符号0は難易度なしを表す
+_DIFFICULTIES: tuple[Difficulty | None, ...] = (None, *Difficulty)
+_DIFFICULTY_CODES = {difficulty: code for code, difficulty in enumerate(_DIFFICULTIES)}
+_SCORE_TYPES = tuple(ScoreType)
+_SCORE_TYPE_CODES = {score_type: code for code, score_type in enumerate(_SCORE_TYPES)}
+_ANSWER_TYPES = tuple(AnswerType)
+_ANSWER_TYPE_CODES = {answer_type: code for code, answer_type in enumerate(_ANSWER_TYPES)}
+
+# 譜例・解答の圧縮表現. 種類の符号と、共有バッファ上の本文の開始位置・終了位置の組
+_Payload = tuple[int, int, int]
+
+
+class _CompactTask:
+    """1件の課題の圧縮表現. 本文は共有バッファ上の位置のみを持つ."""
+
+    __slots__ = ("answers", "description", "difficulty", "id", "score", "tag_ids", "title")
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        task_id: str,
+        title: str | None,
+        description: tuple[int, int],
+        score: _Payload,
+        answers: tuple[_Payload, ...],
+        difficulty: int,
+        tag_ids: tuple[int, ...] | None,
+    ) -> None:
+        self.id = task_id
+        self.title = title
+        self.description = description
+        self.score = score
+        self.answers = answers
+        self.difficulty = difficulty
+        self.tag_ids = tag_ids
+
+
+class CompactTaskStore:
+    """和声課題を圧縮表現で保持する読み取り専用のストア.
+
+    課題の順序は構築時の順序を保つ. 同じIDの課題が複数ある場合は後のものが優先される.
+
+    """
+
+    def __init__(self, tasks: Iterable[HarmonyTask]) -> None:
+        """イニシャライザ.
+
+        Args:
+            tasks: 保持する和声課題.
+
+        """
+        buffer = bytearray()
+        self._tags: list[str] = []
+        self._tag_ids: dict[str, int] = {}
+        records: dict[str, _CompactTask] = {}
+
+        def append(text: str) -> tuple[int, int]:
+            start = len(buffer)
+            buffer.extend(text.encode("utf-8"))
+            return start, len(buffer)
+
+        for task in tasks:
+            records.pop(task.id, None)
+            records[task.id] = _CompactTask(
+                sys.intern(task.id),
+                task.title,
+                append(task.description),
+                (_SCORE_TYPE_CODES[task.score.type], *append(task.score.data)),
+                tuple((_ANSWER_TYPE_CODES[answer.type], *append(answer.data)) for answer in task.answer),
+                _DIFFICULTY_CODES[task.difficulty],
+                None if task.tags is None else tuple(self._intern_tag(tag) for tag in task.tags),
+            )
+        self._buffer = bytes(buffer)
+        self._by_id = records
+        self._records = tuple(records.values())
+
+    def _intern_tag(self, tag: str) -> int:
+        """タグを整数IDに変換する. 初出のタグには新しいIDを割り当てる."""
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self._tags)
+            self._tags.append(sys.intern(tag))
+            self._tag_ids[tag] = tag_id
+        return tag_id
+
+    def __len__(self) -> int:
+        """保持している課題の数."""
+        return len(self._records)
+
+    def __contains__(self, task_id: object) -> bool:
+        """指定されたIDの課題を保持しているかどうか."""
+        return task_id in self._by_id
+
+    def __iter__(self) -> Iterator[HarmonyTask]:
+        """全ての課題を `HarmonyTask` として順に返す."""
+        return map(self._materialize, self._records)
+
+    @property
+    def payload_bytes(self) -> int:
+        """共有バッファのバイト数."""
+        return len(self._buffer)
+
+    def get(self, task_id: str) -> HarmonyTask | None:
+        """指定されたIDの課題を取得する.
+
+        Args:
+            task_id: 課題ID.
+
+        Returns:
+            HarmonyTask | None: 課題. 存在しない場合はNone.
+
+        """
+        record = self._by_id.get(task_id)
+        return None if record is None else self._materialize(record)
+
+    def filter(self, difficulty: str | None = None, tags: Sequence[str] | None = None) -> Iterator[HarmonyTask]:
+        """条件に合致する課題を順に返す. 条件の判定は圧縮表現のまま行う.
+
+        Args:
+            difficulty: 難易度でフィルタする場合の値.
+            tags: タグでフィルタする場合の値のリスト.
+
+        Yields:
+            HarmonyTask: 条件に合致する課題.
+
+        """
+        difficulty_code = None
+        if difficulty is not None:
+            if difficulty not in Difficulty.__members__:
+                return
+            difficulty_code = _DIFFICULTY_CODES[Difficulty(difficulty)]
+        tag_ids = set()
+        for tag in tags or ():
+            if tag not in self._tag_ids:
+                return
+            tag_ids.add(self._tag_ids[tag])
+
+        for record in self._records:
+            if difficulty_code is not None and record.difficulty != difficulty_code:
+                continue
+            if tag_ids and (record.tag_ids is None or not tag_ids.issubset(record.tag_ids)):
+                continue
+            yield self._materialize(record)
+
+    def _text(self, start: int, end: int) -> str:
+        """共有バッファ上の本文を文字列に復元する."""
+        return self._buffer[start:end].decode("utf-8")
+
+    def _materialize(self, record: _CompactTask) -> HarmonyTask:
+        """圧縮表現から `HarmonyTask` を組み立てる. 構築時に検証済みのため再検証はしない."""
+        score_type, *score_span = record.score
+        return HarmonyTask.model_construct(
+            id=record.id,
+            title=record.title,
+            description=self._text(*record.description),
+            score=Score.model_construct(type=_SCORE_TYPES[score_type], data=self._text(*score_span)),
+            answer=[
+                Answer.model_construct(type=_ANSWER_TYPES[answer_type], data=self._text(start, end))
+                for answer_type, start, end in record.answers
+            ],
+            difficulty=_DIFFICULTIES[record.difficulty],
+            tags=None if record.tag_ids is None else [self._tags[tag_id] for tag_id in record.tag_ids],
+        )
@@ -4,9 +4,12 @@
 """
 
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Protocol
 
 from models.harmony_task_model import HarmonyTask
+from models.task_change_model import TaskChange
 
 
 class PersistenceError(Exception):
@@ -21,12 +24,56 @@ class ValidationError(PersistenceError):
     """データバリデーションエラーの例外."""
 
 
+class ChangeLogExpiredError(PersistenceError):
+    """要求された位置以降の変更履歴が既に破棄されている場合の例外."""
+
+
+class TaskChangeListener(Protocol):
+    """和声課題の変更通知を受け取るリスナー.
+
+    索引など課題データから派生するデータを差分更新するために用いる. `previous_version` と
+    `version` は変更を書き込む直前と直後の `catalog_version()` で、どちらも書き込みの排他制御の
+    内側で取得する. リスナーは `previous_version` を自身が保持する派生データの版と比較して
+    別のプロセスによる変更を取りこぼしていないか確かめ、差分を反映した派生データを `version` の
+    ものとして扱う.
+    """
+
+    def task_saved(self, task: HarmonyTask, previous_version: str | None, version: str | None) -> None:
+        """和声課題が保存された後に呼び出される."""
+
+    def task_deleted(self, task_id: str, previous_version: str | None, version: str | None) -> None:
+        """和声課題が削除された後に呼び出される."""
+
+
 class HarmonyTaskRepository(ABC):
     """和声課題リポジトリのインターフェース.
 
     全ての永続化実装(JSON, DB等)はこのインターフェースを実装する必要がある.
     """
 
+    def __init__(self) -> None:
+        """イニシャライザ."""
+        self._listeners: list[TaskChangeListener] = []
+
+    def add_listener(self, listener: TaskChangeListener) -> None:
+        """変更通知を受け取るリスナーを登録する.
+
+        Args:
+            listener: 登録するリスナー.
+
+        """
+        self._listeners.append(listener)
+
+    def _notify_task_saved(self, task: HarmonyTask, previous_version: str | None, version: str | None) -> None:
+        """登録済みのリスナーに保存を通知する."""
+        for listener in self._listeners:
+            listener.task_saved(task, previous_version, version)
+
+    def _notify_task_deleted(self, task_id: str, previous_version: str | None, version: str | None) -> None:
+        """登録済みのリスナーに削除を通知する."""
+        for listener in self._listeners:
+            listener.task_deleted(task_id, previous_version, version)
+
     @abstractmethod
     def save_task(self, task: HarmonyTask) -> None:
         """和声課題を保存する.
@@ -56,6 +103,46 @@ class HarmonyTaskRepository(ABC):
 
         """
 
+    def load_tasks_by_ids(self, task_ids: Sequence[str]) -> dict[str, HarmonyTask | ValidationError]:
+        """指定された複数のIDの和声課題をまとめて取得する.
+
+        既定の実装は `load_task()` を繰り返し呼び出す. 実装ごとに1回の読み込みで
+        解決できる場合はオーバーライドする.
+
+        Args:
+            task_ids (Sequence[str]): 取得する和声課題のIDのリスト.
+
+        Returns:
+            dict[str, HarmonyTask | ValidationError]: IDと和声課題の対応. 存在しないIDは含まない.
+                データが不正な課題は、和声課題の代わりに `ValidationError` を値とする.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        tasks: dict[str, HarmonyTask | ValidationError] = {}
+        for task_id in dict.fromkeys(task_ids):
+            try:
+                tasks[task_id] = self.load_task(task_id)
+            except TaskNotFoundError:
+                continue
+            except ValidationError as e:
+                tasks[task_id] = e
+        return tasks
+
+    @abstractmethod
+    def delete_task(self, task_id: str) -> None:
+        """指定されたIDの和声課題を削除する.
+
+        Args:
+            task_id (str): 削除する和声課題のID.
+
+        Raises:
+            TaskNotFoundError: 指定されたIDのタスクが存在しない場合.
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+
     @abstractmethod
     def list_tasks(
         self,
@@ -76,6 +163,30 @@ class HarmonyTaskRepository(ABC):
 
         """
 
+    def iter_tasks(
+        self,
+        difficulty: str | None = None,
+        tags: Sequence[str] | None = None,
+    ) -> Iterator[HarmonyTask]:
+        """和声課題を1件ずつ順に取得する.
+
+        `list_tasks()` と同じ課題を返すが、一覧全体をリストとして保持しない.
+        既定の実装は `list_tasks()` の結果を順に返す. 逐次読み込みできる実装では
+        オーバーライドする.
+
+        Args:
+            difficulty (str | None): 難易度でフィルタする場合の値.
+            tags (Sequence[str] | None): タグでフィルタする場合の値のリスト.
+
+        Yields:
+            HarmonyTask: フィルタ条件に合致する和声課題.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        yield from self.list_tasks(difficulty, tags)
+
     @abstractmethod
     def load_tasks(self) -> list[HarmonyTask]:
         """全ての和声課題を取得する.
@@ -87,3 +198,77 @@ class HarmonyTaskRepository(ABC):
             PersistenceError: 永続化処理でエラーが発生した場合.
 
         """
+
+    def latest_change_sequence(self) -> int:
+        """最後の変更の通し番号を取得する.
+
+        Returns:
+            int: 最後の変更の通し番号. 変更が無い場合、または変更履歴を持たない実装では0.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        return 0
+
+    def change_log_version(self) -> str | None:
+        """変更履歴の版を表すトークンを取得する.
+
+        変更が書き込まれるとトークンも変わる. 変更の配信で、変更履歴を読み込み直すかどうかの
+        判定に用いる. 既定では `catalog_version()` を返す.
+
+        Returns:
+            str | None: 版を表すトークン. 判定できない実装ではNone.
+
+        """
+        return self.catalog_version()
+
+    def changes_since(self, since: int) -> list[TaskChange]:  # noqa: ARG002
+        """指定された通し番号より後の変更を取得する.
+
+        Args:
+            since: 取得済みの最後の変更の通し番号.
+
+        Returns:
+            list[TaskChange]: 通し番号の昇順に並んだ変更. 変更履歴を持たない実装では空.
+
+        Raises:
+            ChangeLogExpiredError: `since` より後の変更の一部が既に破棄されている場合、
+                または `since` が最後の変更より先の場合.
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        return []
+
+    def catalog_version(self) -> str | None:
+        """課題一覧の版を表すトークンを取得する.
+
+        課題データが変更されるとトークンも変わる. 索引などの派生データを
+        キャッシュする際の無効化判定に用いる.
+
+        Returns:
+            str | None: 版を表すトークン. 判定できない実装ではNone.
+
+        """
+        return None
+
+    def asset_dir(self) -> Path | None:
+        """譜例・解答データのファイルパスを解決する基準ディレクトリを取得する.
+
+        Returns:
+            Path | None: 基準ディレクトリ. ファイルを扱わない実装ではNone.
+
+        """
+        return None
+
+    def derived_data_path(self, name: str) -> Path | None:  # noqa: ARG002
+        """索引など課題データから派生するデータの保存先を取得する.
+
+        Args:
+            name: 派生データの種類を表す名前(拡張子を含む).
+
+        Returns:
+            Path | None: 保存先のパス. 保存先を持たない実装ではNone.
+
+        """
+        return None
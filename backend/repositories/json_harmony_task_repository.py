@@ -4,18 +4,148 @@
 """
 
 import json
-from collections.abc import Sequence
+import os
+import threading
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import TextIO
+
+import pydantic
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
 
 from models.harmony_task_model import HarmonyTask
+from models.task_change_model import TaskChange, TaskChangeType
 from repositories.harmony_task_repository import (
+    ChangeLogExpiredError,
     HarmonyTaskRepository,
     PersistenceError,
     TaskNotFoundError,
     ValidationError,
 )
 
+# 変更履歴として保持する変更の件数
+CHANGE_LOG_LIMIT = 1000
+
+# 同じプロセス内のスレッド間で書き込みを排他するロック
+_THREAD_WRITE_LOCK = threading.Lock()
+
+# 逐次読み込みで1回に読み込む文字数
+_READ_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+class _JsonArrayReader:
+    """トップレベルのオブジェクトが持つ配列の要素を、ファイル全体を読み込まずに順に取り出す.
+
+    配列以外の値は読み飛ばす. 要素は1件ずつ `json.JSONDecoder.raw_decode()` で復元するため、
+    保持するのは読み込み途中のチャンクと復元中の要素のみとなる.
+    """
+
+    def __init__(self, file: TextIO) -> None:
+        self._file = file
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """次のチャンクを読み込む. ファイルの終端に達していればFalseを返す."""
+        if self._eof:
+            return False
+        chunk = self._file.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """空白を読み飛ばし、次の文字を返す. 終端に達した場合は空文字列を返す."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos : self._pos + 1]
+
+    def _expect(self, chars: str) -> str:
+        """次の文字が `chars` のいずれかであることを確認して読み進める."""
+        char = self._peek()
+        if not char or char not in chars:
+            msg = f"Invalid JSON format: expected one of {chars!r} but found {char!r}"
+            raise PersistenceError(msg)
+        self._pos += 1
+        return char
+
+    def _decode(self) -> object:
+        """次のJSON値を復元する. 値が読み込み済みのチャンクに収まらない場合は続きを読み込む."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                msg = f"Invalid JSON format: {e!s}"
+                raise PersistenceError(msg) from e
+            # 数値などはチャンクの末尾で途切れている可能性があるため、続きを読んでから復元し直す
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def iter_items(self, key: str) -> Iterator[object]:
+        """トップレベルのオブジェクトの `key` の配列の要素を順に返す.
+
+        Args:
+            key: 配列を持つキー.
+
+        Yields:
+            object: 配列の要素.
+
+        Raises:
+            PersistenceError: JSONの形式が不正な場合、またはキーが存在しない場合.
+
+        """
+        found = False
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                name = self._decode()
+                self._expect(":")
+                if name == key:
+                    found = True
+                    yield from self._iter_array()
+                else:
+                    self._decode()
+                if self._expect(",}") == "}":
+                    break
+        if not found:
+            msg = f"Invalid JSON format: missing '{key}' field"
+            raise PersistenceError(msg)
+
+    def _iter_array(self) -> Iterator[object]:
+        """配列の要素を順に返す."""
+        if self._peek() != "[":
+            msg = "Invalid JSON format: 'tasks' must be an array"
+            raise PersistenceError(msg)
+        self._pos += 1
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._decode()
+            if self._expect(",]") == "]":
+                return
+
 
 class JsonHarmonyTaskRepository(HarmonyTaskRepository):
     """JSON形式での和声課題リポジトリ実装.
@@ -32,6 +162,7 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
             file_path: JSONファイルの保存パス.
 
         """
+        super().__init__()
         self.file_path = file_path
         self._ensure_file_exists()
 
@@ -64,6 +195,41 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
             initial_data = {"tasks": [], "metadata": self._create_metadata(0)}
             self._save_json(initial_data)
 
+    def catalog_version(self) -> str | None:
+        """JSONファイルのパス・更新時刻・サイズから版を表すトークンを作成する.
+
+        Returns:
+            str | None: 版を表すトークン. ファイルが存在しない場合はNone.
+
+        """
+        path = Path(self.file_path).resolve()
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def asset_dir(self) -> Path | None:
+        """JSONファイルと同じディレクトリを基準ディレクトリとする.
+
+        Returns:
+            Path | None: JSONファイルの親ディレクトリ.
+
+        """
+        return Path(self.file_path).parent
+
+    def derived_data_path(self, name: str) -> Path | None:
+        """JSONファイルと同じ場所に、ファイル名に種類を付けたパスを返す.
+
+        Args:
+            name: 派生データの種類を表す名前(拡張子を含む).
+
+        Returns:
+            Path | None: 例えば `tasks.json` に対して `tasks.embeddings.npy`.
+
+        """
+        return Path(self.file_path).with_suffix(f".{name}")
+
     def _create_metadata(self, total_tasks: int) -> dict:
         """メタデータを作成する.
 
@@ -93,8 +259,11 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
         try:
             path = Path(self.file_path)
             path.parent.mkdir(parents=True, exist_ok=True)
-            with path.open("w", encoding="utf-8") as f:
+            # 書き込み途中のファイルを他のプロセスが読まないよう、一時ファイルに書いてから置き換える
+            temporary_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with temporary_path.open("w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            temporary_path.replace(path)
         except Exception as e:
             msg = f"Failed to save JSON file: {e!s}"
             raise PersistenceError(msg) from e
@@ -154,6 +323,99 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
             msg = f"Failed to read JSON file: {e!s}"
             raise PersistenceError(msg) from e
 
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """JSONファイルの読み込みから書き込みまでを、他のスレッド・プロセスと排他する.
+
+        JSONファイルと同じ場所のロックファイルに排他ロックを掛ける. `fcntl` が無い環境では
+        同じプロセス内のスレッドのみを排他する.
+
+        Raises:
+            OSError: ロックファイルを開けない場合.
+
+        """
+        lock_path = Path(self.file_path).with_suffix(".lock")
+        with _THREAD_WRITE_LOCK, lock_path.open("a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _record_change(self, data: dict, change_type: TaskChangeType, task_id: str) -> None:
+        """変更履歴に変更を追記する. 履歴は新しいものから `CHANGE_LOG_LIMIT` 件まで保持する.
+
+        Args:
+            data: 保存前のJSONデータ.
+            change_type: 変更の種類.
+            task_id: 変更された課題のID.
+
+        """
+        changes = data.setdefault("changes", [])
+        sequence = changes[-1]["sequence"] + 1 if changes else 1
+        changes.append({"sequence": sequence, "type": change_type.value, "taskId": task_id})
+        del changes[:-CHANGE_LOG_LIMIT]
+
+    def latest_change_sequence(self) -> int:
+        """最後の変更の通し番号を取得する.
+
+        Returns:
+            最後の変更の通し番号. 変更が無い場合は0.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        changes = self._load_json().get("changes")
+        return changes[-1]["sequence"] if changes else 0
+
+    def changes_since(self, since: int) -> list[TaskChange]:
+        """指定された通し番号より後の変更を取得する.
+
+        保存の変更には、その課題の現在の内容を添える.
+
+        Args:
+            since: 取得済みの最後の変更の通し番号.
+
+        Returns:
+            通し番号の昇順に並んだ変更.
+
+        Raises:
+            ChangeLogExpiredError: `since` より後の変更の一部が既に破棄されている場合、
+                または `since` が最後の変更より先の場合.
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        try:
+            data = self._load_json()
+            changes = data.get("changes") or []
+            if changes and since < changes[0]["sequence"] - 1:
+                msg = f"Changes after {since} are no longer available"
+                raise ChangeLogExpiredError(msg)  # noqa: TRY301
+            # 変更履歴より先の位置は、ファイルが初期化し直されて通し番号が戻ったことを表す
+            if since > (changes[-1]["sequence"] if changes else 0):
+                msg = f"Change sequence {since} is ahead of the change log"
+                raise ChangeLogExpiredError(msg)  # noqa: TRY301
+            changes = [change for change in changes if change["sequence"] > since]
+            saved_ids = {change["taskId"] for change in changes if change["type"] == TaskChangeType.saved}
+            tasks = {
+                task_data["id"]: HarmonyTask.model_validate(task_data)
+                for task_data in data["tasks"]
+                if task_data["id"] in saved_ids
+            }
+            return [
+                TaskChange(
+                    sequence=change["sequence"],
+                    type=change["type"],
+                    task_id=change["taskId"],
+                    task=tasks.get(change["taskId"]) if change["type"] == TaskChangeType.saved else None,
+                )
+                for change in changes
+            ]
+        except ChangeLogExpiredError:
+            raise
+        except Exception as e:
+            msg = f"Failed to load changes: {e!s}"
+            raise PersistenceError(msg) from e
+
     def _validate_task_data(self, task: object) -> None:
         """タスクデータを検証する.
 
@@ -195,21 +457,25 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
         try:
             self._validate_task_data(task)
 
-            # データの読み込み
-            data = self._load_json()
-            tasks = data["tasks"]
-
-            # 既存のタスクを探す
-            for i, t in enumerate(tasks):
-                if t["id"] == task.id:
-                    tasks[i] = task.model_dump()
-                    self._save_json(data)
-                    return
-
-            # 新規タスクの追加
-            tasks.append(task.model_dump())
-            data["metadata"] = self._create_metadata(len(tasks))
-            self._save_json(data)
+            with self._write_lock():
+                # データの読み込み
+                previous_version = self.catalog_version()
+                data = self._load_json()
+                tasks = data["tasks"]
+
+                # 既存のタスクを探す
+                for i, t in enumerate(tasks):
+                    if t["id"] == task.id:
+                        tasks[i] = task.model_dump()
+                        break
+                else:
+                    # 新規タスクの追加
+                    tasks.append(task.model_dump())
+                    data["metadata"] = self._create_metadata(len(tasks))
+                self._record_change(data, TaskChangeType.saved, task.id)
+                self._save_json(data)
+                version = self.catalog_version()
+            self._notify_task_saved(task, previous_version, version)
         except (ValidationError, TaskNotFoundError):
             raise
         except Exception as e:
@@ -248,6 +514,39 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
             msg = f"Failed to load task: {e!s}"
             raise PersistenceError(msg) from e
 
+    def load_tasks_by_ids(self, task_ids: Sequence[str]) -> dict[str, HarmonyTask | ValidationError]:
+        """指定された複数のIDの和声課題を、JSONファイルを1回読み込んで取得する.
+
+        Args:
+            task_ids: 取得する和声課題のIDのリスト.
+
+        Returns:
+            IDと和声課題の対応. 存在しないIDは含まない. データが不正な課題は、
+            和声課題の代わりに `ValidationError` を値とする.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        wanted = set(task_ids)
+        tasks: dict[str, HarmonyTask | ValidationError] = {}
+        try:
+            data = self._load_json()
+            for task_data in data["tasks"]:
+                task_id = task_data.get("id") if isinstance(task_data, dict) else None
+                if task_id in wanted and task_id not in tasks:
+                    try:
+                        tasks[task_id] = HarmonyTask.model_validate(task_data)
+                    except pydantic.ValidationError as e:
+                        # 1件のデータの不正で一括取得全体を失敗させず、その課題の結果として返す
+                        tasks[task_id] = ValidationError(f"Invalid task data: {e!s}")
+                    if len(tasks) == len(wanted):
+                        break
+        except Exception as e:
+            msg = f"Failed to load tasks: {e!s}"
+            raise PersistenceError(msg) from e
+        return tasks
+
     def delete_task(self, task_id: str) -> None:
         """指定されたIDの和声課題を削除する.
 
@@ -260,16 +559,20 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
 
         """
         try:
-            data = self._load_json()
-            tasks = data["tasks"]
-            original_length = len(tasks)
-            tasks[:] = [t for t in tasks if t["id"] != task_id]
-
-            if len(tasks) == original_length:
-                self._handle_missing_task(task_id)
-            else:
+            with self._write_lock():
+                previous_version = self.catalog_version()
+                data = self._load_json()
+                tasks = data["tasks"]
+                original_length = len(tasks)
+                tasks[:] = [t for t in tasks if t["id"] != task_id]
+
+                if len(tasks) == original_length:
+                    self._handle_missing_task(task_id)
                 data["metadata"] = self._create_metadata(len(tasks))
+                self._record_change(data, TaskChangeType.deleted, task_id)
                 self._save_json(data)
+                version = self.catalog_version()
+            self._notify_task_deleted(task_id, previous_version, version)
         except TaskNotFoundError:
             raise
         except Exception as e:
@@ -322,6 +625,43 @@ class JsonHarmonyTaskRepository(HarmonyTaskRepository):
             msg = f"Failed to list tasks: {e!s}"
             raise PersistenceError(msg) from e
 
+    def iter_tasks(
+        self,
+        difficulty: str | None = None,
+        tags: Sequence[str] | None = None,
+    ) -> Iterator[HarmonyTask]:
+        """JSONファイルを先頭から逐次読み込み、条件に合致する和声課題を順に返す.
+
+        ファイル全体を読み込まないため、課題数によらずメモリ使用量は一定となる.
+        不正な課題は `list_tasks()` と同様に読み飛ばす.
+
+        Args:
+            difficulty: 難易度でフィルタする場合の値.
+            tags: タグでフィルタする場合の値のリスト.
+
+        Yields:
+            HarmonyTask: フィルタ条件に合致する和声課題.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        try:
+            with Path(self.file_path).open(encoding="utf-8") as f:
+                for task_data in _JsonArrayReader(f).iter_items("tasks"):
+                    try:
+                        task = HarmonyTask.model_validate(task_data)
+                    except Exception:  # noqa: BLE001, S112
+                        continue
+                    if difficulty is not None and task.difficulty != difficulty:
+                        continue
+                    if tags and (not task.tags or not all(t in task.tags for t in tags)):
+                        continue
+                    yield task
+        except OSError as e:
+            msg = f"Failed to read JSON file: {e!s}"
+            raise PersistenceError(msg) from e
+
     def load_tasks(self) -> list[HarmonyTask]:
         """全ての和声課題を取得する.
 
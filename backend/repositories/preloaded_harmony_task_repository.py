@@ -0,0 +1,286 @@
+"""読み込み済みの課題一覧をメモリ上で共有するリポジトリの実装.
+
+起動時に元のリポジトリから課題一覧を1度だけ読み込み、以降の参照はメモリ上の
+スナップショットから返す. フォーク型のマルチワーカー構成では、マスタープロセスで
+読み込んでからフォークすることで、各ワーカーが同じメモリページを共有できる.
+課題は `CompactTaskStore` の圧縮表現で保持し、`HarmonyTask` は参照時に組み立てる.
+"""
+
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+
+from models.harmony_task_model import HarmonyTask
+from models.task_change_model import TaskChange
+from repositories.compact_task_store import CompactTaskStore
+from repositories.harmony_task_repository import HarmonyTaskRepository, TaskNotFoundError, ValidationError
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """ある時点の課題一覧."""
+
+    store: CompactTaskStore
+    version: str | None
+
+
+class PreloadedHarmonyTaskRepository(HarmonyTaskRepository):
+    """課題一覧をメモリ上に保持するリポジトリ実装.
+
+    参照系はメモリ上のスナップショットから返し、更新系は元のリポジトリに委譲する.
+    元のリポジトリからの変更通知を受けてスナップショットを読み込み直し、通知を自身の
+    リスナーへ転送する. スナップショットは丸ごと差し替えるため、
+    読み込み直しの最中もリクエストは一貫した課題一覧を参照できる.
+
+    Attributes:
+        source (HarmonyTaskRepository): 課題一覧の読み込み元.
+
+    """
+
+    def __init__(self, source: HarmonyTaskRepository) -> None:
+        """イニシャライザ.
+
+        Args:
+            source: 課題一覧の読み込み元.
+
+        Raises:
+            PersistenceError: 課題一覧の読み込みに失敗した場合.
+
+        """
+        super().__init__()
+        self.source = source
+        self._reload_lock = Lock()
+        self._snapshot = self._read_snapshot()
+        source.add_listener(_SourceListener(self))
+
+    def _read_snapshot(self) -> _Snapshot:
+        """元のリポジトリから課題一覧を読み込む."""
+        version = self.source.catalog_version()
+        return _Snapshot(CompactTaskStore(self.source.load_tasks()), version)
+
+    def reload(self) -> None:
+        """元のリポジトリから課題一覧を読み込み直す.
+
+        Raises:
+            PersistenceError: 課題一覧の読み込みに失敗した場合. スナップショットは変更されない.
+
+        """
+        with self._reload_lock:
+            self._snapshot = self._read_snapshot()
+
+    def refresh(self) -> bool:
+        """元のリポジトリの版がスナップショットと異なる場合に限り、課題一覧を読み込み直す.
+
+        別のプロセスが元のリポジトリに書き込んだ変更を取り込むために用いる. 版の確認は
+        ファイルの状態を調べる程度の負荷のため、リクエストごとに呼び出せる.
+
+        Returns:
+            bool: 読み込み直した場合はTrue.
+
+        Raises:
+            PersistenceError: 課題一覧の読み込みに失敗した場合. スナップショットは変更されない.
+
+        """
+        if self.source.catalog_version() == self._snapshot.version:
+            return False
+        with self._reload_lock:
+            # 待っている間に別のスレッドが読み込み直している場合がある
+            if self.source.catalog_version() == self._snapshot.version:
+                return False
+            self._snapshot = self._read_snapshot()
+        return True
+
+    def catalog_version(self) -> str | None:
+        """スナップショットを読み込んだ時点の元のリポジトリの版を返す.
+
+        Returns:
+            str | None: 版を表すトークン.
+
+        """
+        return self._snapshot.version
+
+    def latest_change_sequence(self) -> int:
+        """元のリポジトリの最後の変更の通し番号を取得する.
+
+        Returns:
+            int: 最後の変更の通し番号.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        return self.source.latest_change_sequence()
+
+    def change_log_version(self) -> str | None:
+        """元のリポジトリの現在の版を返す.
+
+        スナップショットの版とは異なり、別のプロセスが元のリポジトリに書き込んだ変更でも変わる.
+
+        Returns:
+            str | None: 版を表すトークン.
+
+        """
+        return self.source.catalog_version()
+
+    def changes_since(self, since: int) -> list[TaskChange]:
+        """元のリポジトリから指定された通し番号より後の変更を取得する.
+
+        Args:
+            since: 取得済みの最後の変更の通し番号.
+
+        Returns:
+            list[TaskChange]: 通し番号の昇順に並んだ変更.
+
+        Raises:
+            ChangeLogExpiredError: `since` より後の変更の一部が既に破棄されている場合、
+                または `since` が最後の変更より先の場合.
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        return self.source.changes_since(since)
+
+    def asset_dir(self) -> Path | None:
+        """元のリポジトリの基準ディレクトリを返す.
+
+        Returns:
+            Path | None: 基準ディレクトリ.
+
+        """
+        return self.source.asset_dir()
+
+    def derived_data_path(self, name: str) -> Path | None:
+        """元のリポジトリの派生データの保存先を返す.
+
+        Args:
+            name: 派生データの種類を表す名前(拡張子を含む).
+
+        Returns:
+            Path | None: 保存先のパス.
+
+        """
+        return self.source.derived_data_path(name)
+
+    def save_task(self, task: HarmonyTask) -> None:
+        """和声課題を元のリポジトリに保存する. スナップショットは変更通知を受けて更新される.
+
+        Args:
+            task: 保存する和声課題.
+
+        Raises:
+            PersistenceError: 永続化処理でエラーが発生した場合.
+            ValidationError: タスクデータが不正な場合.
+
+        """
+        self.source.save_task(task)
+
+    def delete_task(self, task_id: str) -> None:
+        """和声課題を元のリポジトリから削除する. スナップショットは変更通知を受けて更新される.
+
+        Args:
+            task_id: 削除する和声課題のID.
+
+        Raises:
+            TaskNotFoundError: 指定されたIDのタスクが存在しない場合.
+            PersistenceError: 永続化処理でエラーが発生した場合.
+
+        """
+        self.source.delete_task(task_id)
+
+    def load_task(self, task_id: str) -> HarmonyTask:
+        """指定されたIDの和声課題を取得する.
+
+        Args:
+            task_id: 取得する和声課題のID.
+
+        Returns:
+            読み込まれた和声課題.
+
+        Raises:
+            TaskNotFoundError: 指定されたIDのタスクが存在しない場合.
+
+        """
+        task = self._snapshot.store.get(task_id)
+        if task is None:
+            msg = f"Task not found: {task_id}"
+            raise TaskNotFoundError(msg)
+        return task
+
+    def load_tasks_by_ids(self, task_ids: Sequence[str]) -> dict[str, HarmonyTask | ValidationError]:
+        """指定された複数のIDの和声課題をまとめて取得する.
+
+        Args:
+            task_ids: 取得する和声課題のIDのリスト.
+
+        Returns:
+            dict[str, HarmonyTask | ValidationError]: IDと和声課題の対応. 存在しないIDは含まない.
+                スナップショットは読み込み時に検証済みのため、`ValidationError` は含まない.
+
+        """
+        store = self._snapshot.store
+        return {task_id: task for task_id in dict.fromkeys(task_ids) if (task := store.get(task_id)) is not None}
+
+    def list_tasks(
+        self,
+        difficulty: str | None = None,
+        tags: Sequence[str] | None = None,
+    ) -> list[HarmonyTask]:
+        """和声課題の一覧を取得する.
+
+        Args:
+            difficulty: 難易度でフィルタする場合の値.
+            tags: タグでフィルタする場合の値のリスト.
+
+        Returns:
+            フィルタ条件に合致する和声課題のリスト.
+
+        """
+        return list(self._snapshot.store.filter(difficulty, tags))
+
+    def iter_tasks(
+        self,
+        difficulty: str | None = None,
+        tags: Sequence[str] | None = None,
+    ) -> Iterator[HarmonyTask]:
+        """和声課題を1件ずつ順に取得する. `HarmonyTask` は1件ずつ組み立てる.
+
+        Args:
+            difficulty: 難易度でフィルタする場合の値.
+            tags: タグでフィルタする場合の値のリスト.
+
+        Returns:
+            Iterator[HarmonyTask]: フィルタ条件に合致する和声課題.
+
+        """
+        return self._snapshot.store.filter(difficulty, tags)
+
+    def load_tasks(self) -> list[HarmonyTask]:
+        """全ての和声課題を取得する.
+
+        Returns:
+            list[HarmonyTask]: 読み込まれた和声課題のリスト.
+
+        """
+        return list(self._snapshot.store)
+
+
+class _SourceListener:
+    """元のリポジトリの変更をスナップショットに反映し、通知を転送するリスナー.
+
+    転送する `previous_version` は元のリポジトリが書き込む直前の版のため、スナップショットの
+    版と一致しない場合は別のプロセスによる変更が間に入ったことを表す.
+    """
+
+    def __init__(self, repository: PreloadedHarmonyTaskRepository) -> None:
+        """イニシャライザ."""
+        self._repository = repository
+
+    def task_saved(self, task: HarmonyTask, previous_version: str | None, version: str | None) -> None:
+        """スナップショットを読み込み直し、保存を通知する."""
+        self._repository.reload()
+        self._repository._notify_task_saved(task, previous_version, version)  # noqa: SLF001
+
+    def task_deleted(self, task_id: str, previous_version: str | None, version: str | None) -> None:
+        """スナップショットを読み込み直し、削除を通知する."""
+        self._repository.reload()
+        self._repository._notify_task_deleted(task_id, previous_version, version)  # noqa: SLF001
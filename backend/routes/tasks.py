@@ -1,19 +1,84 @@
 """Tasks(和声課題)に関するルート定義."""
 
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from itertools import chain
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
-from models.harmony_task_model import HarmonyTask
+from models.harmony_task_model import Answer, HarmonyTask, Score
+from models.task_change_model import TaskChange
 from repositories.harmony_task_repository import (
+    ChangeLogExpiredError,
     HarmonyTaskRepository,
     TaskNotFoundError,
+    ValidationError,
 )
 from repositories.json_harmony_task_repository import JsonHarmonyTaskRepository
+from services.catalog_index_cache import CatalogIndexCache
+from services.melodic_pattern_index import MelodicMatch, MelodicPatternIndex, parse_scale_degree, to_intervals
+from services.midi_renderer import DEFAULT_TEMPO, content_hash, render_midi
+from services.realization_solver import (
+    DEFAULT_RESULTS,
+    DEFAULT_TIME_BUDGET,
+    Realization,
+    RealizationError,
+    realize_task,
+)
+from services.render_cache import RenderCache
+from services.score_parser import ScoreParseError, parse_pitch, parse_score_data, read_score_data
+from services.task_similarity import SimilarTask, TaskEmbeddingIndex, load_or_build_index, save_index
 
 router = APIRouter()
 
+# 変更のServer-Sent Events配信で変更を確認する間隔と、接続維持のコメントを送る間隔(秒)
+EVENTS_POLL_INTERVAL = 1.0
+EVENTS_KEEPALIVE_INTERVAL = 15.0
+
+# 一括取得で指定できる課題IDの上限
+MAX_BATCH_IDS = 100
+
+
+class TaskBatchItem(BaseModel):
+    """一括取得の1件分の結果.
+
+    Attributes:
+        id (str): 指定された課題ID
+        task (HarmonyTask | None): 課題. 取得できなかった場合はNone
+        error (str | None): 取得できなかった理由
+
+    """
+
+    id: str
+    task: HarmonyTask | None = None
+    error: str | None = None
+
+
+melodic_index_cache: CatalogIndexCache[MelodicPatternIndex] = CatalogIndexCache(
+    lambda repository: MelodicPatternIndex.from_tasks(repository.load_tasks(), repository.asset_dir()),
+)
+similarity_index_cache: CatalogIndexCache[TaskEmbeddingIndex] = CatalogIndexCache(load_or_build_index, save_index)
+
+
+def attach_index_caches(repository: HarmonyTaskRepository) -> HarmonyTaskRepository:
+    """リポジトリ経由の保存・削除が索引に差分反映されるよう、索引キャッシュを登録する.
+
+    Args:
+        repository: 和声課題リポジトリ
+
+    Returns:
+        HarmonyTaskRepository: 索引キャッシュを登録したリポジトリ
+
+    """
+    melodic_index_cache.attach(repository)
+    similarity_index_cache.attach(repository)
+    return repository
+
 
 def get_repository() -> HarmonyTaskRepository:
     """リポジトリのインスタンスを取得する."""
@@ -21,7 +86,7 @@ def get_repository() -> HarmonyTaskRepository:
     project_root = Path(__file__).parent.parent
     data_dir = project_root / "data"
     tasks_file = data_dir / "tasks.json"
-    return JsonHarmonyTaskRepository(str(tasks_file))
+    return attach_index_caches(JsonHarmonyTaskRepository(str(tasks_file)))
 
 
 @router.get("/tasks")
@@ -43,6 +108,261 @@ def list_tasks(
         raise HTTPException(status_code=404, detail="Tasks not found") from err
 
 
+@router.get("/tasks:batchGet")
+def batch_get_tasks(
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    ids: Annotated[str, Query(description="カンマ区切りの課題ID. 例: 1,2,3")],
+) -> list[TaskBatchItem]:
+    """複数の課題をまとめて取得する.
+
+    存在しない課題やデータが不正な課題があってもリクエスト全体は失敗させず、項目ごとにエラーを返す.
+
+    Args:
+        repository: 和声課題リポジトリ
+        ids: カンマ区切りの課題ID
+
+    Returns:
+        list[TaskBatchItem]: 指定された順(重複は除く)の取得結果
+
+    Raises:
+        HTTPException: IDの指定が空または多すぎる場合は400を返す
+
+    """
+    task_ids = list(dict.fromkeys(task_id for task_id in (value.strip() for value in ids.split(",")) if task_id))
+    if not task_ids:
+        raise HTTPException(status_code=400, detail="Specify at least one task id")
+    if len(task_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} task ids can be requested")
+    tasks = repository.load_tasks_by_ids(task_ids)
+    items = []
+    for task_id in task_ids:
+        task = tasks.get(task_id)
+        if task is None:
+            items.append(TaskBatchItem(id=task_id, error="Task not found"))
+        elif isinstance(task, ValidationError):
+            items.append(TaskBatchItem(id=task_id, error="Invalid task data"))
+        else:
+            items.append(TaskBatchItem(id=task_id, task=task))
+    return items
+
+
+@router.get("/tasks:export", response_class=StreamingResponse)
+def export_tasks(
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    output_format: Annotated[
+        Literal["json", "ndjson"],
+        Query(alias="format", description="出力形式. JSON配列または改行区切りJSON"),
+    ] = "json",
+) -> StreamingResponse:
+    """課題の一覧を逐次エンコードしながら返す.
+
+    一覧全体をメモリ上に保持しないため、課題数によらずメモリ使用量は一定となる.
+
+    Args:
+        repository: 和声課題リポジトリ
+        output_format: 出力形式
+
+    Returns:
+        StreamingResponse: JSON配列または改行区切りJSONのストリーム
+
+    """
+    tasks = repository.iter_tasks()
+    # 読み込み開始時のエラーはストリームを開始する前に通常のエラーレスポンスとして返す
+    first = next(tasks, None)
+    if output_format == "ndjson":
+        return StreamingResponse(_encode_ndjson(first, tasks), media_type="application/x-ndjson")
+    return StreamingResponse(_encode_json_array(first, tasks), media_type="application/json")
+
+
+def _encode_json_array(first: HarmonyTask | None, rest: Iterator[HarmonyTask]) -> Iterator[bytes]:
+    """課題を1件ずつJSON配列の一部としてエンコードする."""
+    if first is None:
+        yield b"[]"
+        return
+    yield b"[" + first.model_dump_json().encode()
+    for task in rest:
+        yield b"," + task.model_dump_json().encode()
+    yield b"]"
+
+
+def _encode_ndjson(first: HarmonyTask | None, rest: Iterator[HarmonyTask]) -> Iterator[bytes]:
+    """課題を1件ずつ改行区切りJSONの1行としてエンコードする."""
+    if first is None:
+        return
+    for task in chain((first,), rest):
+        yield task.model_dump_json().encode() + b"\n"
+
+
+@router.get("/tasks/search/melodic")
+def search_melodic_pattern(
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    intervals: Annotated[str | None, Query(description="カンマ区切りの音程列(半音数). 例: -1,-1,-1")] = None,
+    notes: Annotated[str | None, Query(description="カンマ区切りの音名列. 例: D4,C#4,C4,B3")] = None,
+    degrees: Annotated[str | None, Query(description="カンマ区切りの音度列. 例: 5,4,b3,2,1")] = None,
+) -> list[MelodicMatch]:
+    """与えられた声部に旋律パターンを含む課題を検索する.
+
+    パターンは音程列、音名列、音度列のいずれか1つで指定する. 音名列は音程列に変換して
+    検索するため、移調したパターンにも一致する. 音度は長音階を基準に臨時記号で変化させて
+    表し(短調の第3音は "b3")、調号を持つ譜例の課題のみが検索の対象となる.
+
+    Args:
+        repository: 和声課題リポジトリ
+        intervals: カンマ区切りの音程列
+        notes: カンマ区切りの音名列
+        degrees: カンマ区切りの音度列
+
+    Returns:
+        list[MelodicMatch]: 一致した課題IDと位置のリスト
+
+    Raises:
+        HTTPException: パターンの指定が不正な場合は400を返す
+
+    """
+    if sum(value is not None for value in (intervals, notes, degrees)) != 1:
+        raise HTTPException(status_code=400, detail="Specify exactly one of 'intervals', 'notes' or 'degrees'")
+    try:
+        if degrees is not None:
+            degree_pattern = [parse_scale_degree(value) for value in degrees.split(",")]
+            return melodic_index_cache.get(repository).search_scale_degrees(degree_pattern)
+        if intervals is not None:
+            pattern = tuple(int(value) for value in intervals.split(","))
+        else:
+            pattern = to_intervals([parse_pitch(value) for value in (notes or "").split(",")])
+        return melodic_index_cache.get(repository).search(pattern)
+    except (ValueError, ScoreParseError) as err:
+        raise HTTPException(status_code=400, detail=f"Invalid pattern: {err!s}") from err
+
+
+@router.get("/tasks/changes")
+def get_task_changes(
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    since: Annotated[int, Query(ge=0, description="取得済みの最後の変更の通し番号")] = 0,
+) -> list[TaskChange]:
+    """指定された通し番号より後の課題の変更を取得する.
+
+    Args:
+        repository: 和声課題リポジトリ
+        since: 取得済みの最後の変更の通し番号
+
+    Returns:
+        list[TaskChange]: 通し番号の昇順に並んだ変更
+
+    Raises:
+        HTTPException: 変更履歴が既に破棄されている場合、または `since` が最後の変更より先の場合は
+            410を返す. 課題一覧を取得し直す必要がある
+
+    """
+    try:
+        return repository.changes_since(since)
+    except ChangeLogExpiredError as err:
+        raise HTTPException(status_code=410, detail="Change log expired; reload the task list") from err
+
+
+@router.get("/tasks/events", response_class=StreamingResponse)
+def stream_task_changes(
+    request: Request,
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    since: Annotated[int | None, Query(ge=0, description="取得済みの最後の変更の通し番号")] = None,
+    last_event_id: Annotated[str | None, Header(description="再接続時にブラウザが送る最後のイベントID")] = None,
+) -> StreamingResponse:
+    """課題の変更をServer-Sent Eventsで配信する.
+
+    `since` も `Last-Event-ID` も指定されない場合は、接続以降の変更のみを配信する.
+
+    Args:
+        request: リクエスト
+        repository: 和声課題リポジトリ
+        since: 取得済みの最後の変更の通し番号
+        last_event_id: 再接続時の最後のイベントID
+
+    Returns:
+        StreamingResponse: `text/event-stream` のストリーム
+
+    Raises:
+        HTTPException: 変更履歴が既に破棄されている場合、または `since` が最後の変更より先の場合は410を返す
+
+    """
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = repository.latest_change_sequence()
+    try:
+        pending = repository.changes_since(since)
+    except ChangeLogExpiredError as err:
+        raise HTTPException(status_code=410, detail="Change log expired; reload the task list") from err
+    return StreamingResponse(
+        task_change_events(repository, since, pending, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def task_change_events(
+    repository: HarmonyTaskRepository,
+    since: int,
+    pending: list[TaskChange],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: float = EVENTS_POLL_INTERVAL,
+) -> AsyncIterator[str]:
+    """課題の変更をServer-Sent Eventsの形式で順に返す.
+
+    変更履歴の版(`change_log_version()`)が変わった時だけ変更履歴を読み込むため、
+    変更が無い間の負荷は小さい. 変更履歴の版は保存先のファイルに追従するため、
+    別のワーカープロセスによる変更も配信される.
+
+    Args:
+        repository: 和声課題リポジトリ
+        since: 配信済みの最後の変更の通し番号
+        pending: 最初に配信する変更
+        is_disconnected: クライアントが切断したかどうかを返す関数
+        poll_interval: 変更を確認する間隔(秒)
+
+    Yields:
+        str: イベント. 変更が無い間は一定間隔でコメント行を返し、接続を維持する
+
+    """
+    # 配信開始までの間の変更を取りこぼさないよう、最初の確認では必ず変更履歴を読み込む
+    version: str | None = None
+    idle = 0.0
+    while not await is_disconnected():
+        for change in pending:
+            yield f"id: {change.sequence}\nevent: {change.type.value}\ndata: {change.model_dump_json()}\n\n"
+            since = change.sequence
+        if pending:
+            idle = 0.0
+        elif idle >= EVENTS_KEEPALIVE_INTERVAL:
+            yield ": keep-alive\n\n"
+            idle = 0.0
+        await asyncio.sleep(poll_interval)
+        idle += poll_interval
+        current = await run_in_threadpool(repository.change_log_version)
+        if current is not None and current == version:
+            pending = []
+            continue
+        version = current
+        try:
+            pending = await run_in_threadpool(repository.changes_since, since)
+        except ChangeLogExpiredError:
+            yield "event: expired\ndata: {}\n\n"
+            return
+
+
 @router.get("/tasks/{task_id}")
 def get_task(
     task_id: str,
@@ -68,3 +388,178 @@ def get_task(
         return repository.load_task(task_id)
     except TaskNotFoundError as err:
         raise HTTPException(status_code=404, detail="Task not found") from err
+
+
+@router.get("/tasks/{task_id}/similar")
+def get_similar_tasks(
+    task_id: str,
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    k: Annotated[int, Query(ge=1, le=100, description="返す類似課題の件数")] = 5,
+) -> list[SimilarTask]:
+    """指定された課題に似た課題を取得する.
+
+    Args:
+        task_id: 基準とする課題のID
+        repository: 和声課題リポジトリ
+        k: 返す類似課題の件数
+
+    Returns:
+        list[SimilarTask]: 類似度の降順に並んだ類似課題
+
+    Raises:
+        HTTPException: 課題が見つからない場合は404を返す
+
+    """
+    index = similarity_index_cache.get(repository)
+    if task_id not in index:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return index.similar(task_id, k)
+
+
+@router.get("/tasks/{task_id}/realizations")
+def get_realizations(
+    task_id: str,
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    n: Annotated[int, Query(ge=1, le=10, description="返す実施の件数")] = DEFAULT_RESULTS,
+    time_budget: Annotated[float, Query(gt=0, le=5, description="探索の時間上限(秒)")] = DEFAULT_TIME_BUDGET,
+) -> list[Realization]:
+    """与えられた声部から推奨される実施(模範解答)を生成する.
+
+    Args:
+        task_id: 課題のID
+        repository: 和声課題リポジトリ
+        n: 返す実施の件数
+        time_budget: 探索の時間上限(秒)
+
+    Returns:
+        list[Realization]: コストの昇順に並んだ実施
+
+    Raises:
+        HTTPException: 課題が見つからない場合は404、実施を生成できない場合は422を返す
+
+    """
+    try:
+        task = repository.load_task(task_id)
+        return realize_task(task, repository.asset_dir(), n_results=n, time_budget=time_budget)
+    except TaskNotFoundError as err:
+        raise HTTPException(status_code=404, detail="Task not found") from err
+    except RealizationError as err:
+        raise HTTPException(status_code=422, detail=f"Cannot realize task: {err!s}") from err
+
+
+TempoQuery = Annotated[int, Query(ge=20, le=300, description="テンポ(BPM)")]
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Matchヘッダーが指定のETagに一致するか."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _midi_response(
+    request: Request,
+    score: Score | Answer,
+    repository: HarmonyTaskRepository,
+    tempo: int,
+) -> Response:
+    """譜例または解答をMIDIに変換して返す.
+
+    内容ハッシュをETagとし、一致する場合は304を返す. 変換結果はリポジトリの
+    派生データとしてディスクにキャッシュする.
+    """
+    try:
+        data = read_score_data(score, repository.asset_dir())
+    except ScoreParseError as err:
+        raise HTTPException(status_code=422, detail=f"Cannot render score: {err!s}") from err
+
+    key = content_hash(score.type.value, data, tempo)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "no-cache"}
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    def render() -> bytes:
+        return render_midi(parse_score_data(score.type, data), tempo)
+
+    cache_dir = repository.derived_data_path("midi-cache")
+    try:
+        body = RenderCache(cache_dir, suffix=".mid").get_or_render(key, render) if cache_dir else render()
+    except ScoreParseError as err:
+        raise HTTPException(status_code=422, detail=f"Cannot render score: {err!s}") from err
+    return Response(content=body, media_type="audio/midi", headers=headers)
+
+
+@router.get("/tasks/{task_id}/score.mid", response_class=Response)
+def get_score_midi(
+    task_id: str,
+    request: Request,
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    tempo: TempoQuery = DEFAULT_TEMPO,
+) -> Response:
+    """課題の譜例をStandard MIDI Fileとして取得する.
+
+    Args:
+        task_id: 課題のID
+        request: リクエスト(If-None-Matchの判定に用いる)
+        repository: 和声課題リポジトリ
+        tempo: テンポ(BPM)
+
+    Returns:
+        Response: MIDIデータ. ETagが一致する場合は304
+
+    Raises:
+        HTTPException: 課題が見つからない場合は404、変換できない場合は422を返す
+
+    """
+    try:
+        task = repository.load_task(task_id)
+    except TaskNotFoundError as err:
+        raise HTTPException(status_code=404, detail="Task not found") from err
+    return _midi_response(request, task.score, repository, tempo)
+
+
+@router.get("/tasks/{task_id}/answers/{answer_index}.mid", response_class=Response)
+def get_answer_midi(
+    task_id: str,
+    answer_index: int,
+    request: Request,
+    repository: Annotated[
+        HarmonyTaskRepository,
+        Depends(get_repository),
+    ],
+    tempo: TempoQuery = DEFAULT_TEMPO,
+) -> Response:
+    """課題の解答をStandard MIDI Fileとして取得する.
+
+    Args:
+        task_id: 課題のID
+        answer_index: 解答の番号(0始まり)
+        request: リクエスト(If-None-Matchの判定に用いる)
+        repository: 和声課題リポジトリ
+        tempo: テンポ(BPM)
+
+    Returns:
+        Response: MIDIデータ. ETagが一致する場合は304
+
+    Raises:
+        HTTPException: 課題・解答が見つからない場合は404、変換できない場合は422を返す
+
+    """
+    try:
+        task = repository.load_task(task_id)
+    except TaskNotFoundError as err:
+        raise HTTPException(status_code=404, detail="Task not found") from err
+    if not 0 <= answer_index < len(task.answer):
+        raise HTTPException(status_code=404, detail="Answer not found")
+    return _midi_response(request, task.answer[answer_index], repository, tempo)
@@ -0,0 +1 @@
+"""和声課題を扱うドメインサービスを提供するパッケージ."""
@@ -0,0 +1,135 @@
+"""課題一覧から構築する派生データ(索引など)のキャッシュ.
+
+リポジトリの `catalog_version()` が変わらない限り、構築済みの索引を再利用する.
+キャッシュを登録したリポジトリ経由の保存・削除は、索引の再構築ではなく差分更新で反映する.
+ただし書き込み直前の版がキャッシュ済みの版と異なる場合(別のプロセスによる変更が間に入った場合)は
+差分を適用せずに破棄し、次の取得時に構築し直す. 差分を適用した派生データの版には、書き込み直後に
+リポジトリが排他制御の内側で取得した版を用いる.
+"""
+
+from collections.abc import Callable
+from threading import Lock
+from typing import Generic, Protocol, TypeVar
+
+from models.harmony_task_model import HarmonyTask
+from repositories.harmony_task_repository import HarmonyTaskRepository
+
+
+class IncrementalIndex(Protocol):
+    """課題の保存・削除を差分で反映できる派生データ."""
+
+    def task_saved(self, task: HarmonyTask) -> None:
+        """保存された課題を反映する."""
+
+    def task_deleted(self, task_id: str) -> None:
+        """削除された課題を取り除く."""
+
+
+T = TypeVar("T", bound=IncrementalIndex)
+
+
+class CatalogIndexCache(Generic[T]):  # noqa: UP046
+    """課題一覧の版ごとに派生データを1つ保持するキャッシュ.
+
+    リポジトリが版を返さない場合はキャッシュせず、毎回構築する.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[HarmonyTaskRepository], T],
+        persist: Callable[[HarmonyTaskRepository, T, str | None], None] | None = None,
+    ) -> None:
+        """イニシャライザ.
+
+        Args:
+            build: リポジトリから派生データを構築する関数.
+            persist: 差分更新した派生データを、その版とともに保存する関数. 保存しない場合はNone.
+
+        """
+        self._build = build
+        self._persist = persist
+        self._lock = Lock()
+        self._version: str | None = None
+        self._value: T | None = None
+
+    def get(self, repository: HarmonyTaskRepository) -> T:
+        """リポジトリの現在の版に対応する派生データを取得する.
+
+        Args:
+            repository: 派生データの元となるリポジトリ.
+
+        Returns:
+            T: 構築済みの派生データ.
+
+        """
+        version = repository.catalog_version()
+        if version is None:
+            return self._build(repository)
+        with self._lock:
+            if self._value is None or self._version != version:
+                self._value = self._build(repository)
+                self._version = version
+            return self._value
+
+    def attach(self, repository: HarmonyTaskRepository) -> None:
+        """リポジトリの保存・削除をキャッシュ済みの派生データへ差分反映する.
+
+        Args:
+            repository: 変更通知を受け取るリポジトリ.
+
+        """
+        repository.add_listener(_CacheUpdater(self, repository))
+
+    def clear(self) -> None:
+        """保持している派生データを破棄する."""
+        with self._lock:
+            self._version = None
+            self._value = None
+
+    def apply(
+        self,
+        repository: HarmonyTaskRepository,
+        previous_version: str | None,
+        version: str | None,
+        update: Callable[[T], None],
+    ) -> None:
+        """キャッシュ済みの派生データを更新し、版を変更後のものに進める.
+
+        書き込み直前の版がキャッシュ済みの版と一致しない場合は、差分だけでは別の変更を
+        取りこぼすため、派生データを破棄する.
+
+        Args:
+            repository: 変更が行われたリポジトリ.
+            previous_version: 変更を書き込む直前の版.
+            version: 変更を書き込んだ直後の版.
+            update: 派生データを差分更新する関数.
+
+        """
+        with self._lock:
+            if self._value is None:
+                return
+            if previous_version is None or version is None or previous_version != self._version:
+                self._version = None
+                self._value = None
+                return
+            update(self._value)
+            self._version = version
+            if self._persist is not None:
+                self._persist(repository, self._value, version)
+
+
+class _CacheUpdater:
+    """リポジトリの変更通知をキャッシュへ転送するリスナー."""
+
+    def __init__(self, cache: CatalogIndexCache, repository: HarmonyTaskRepository) -> None:
+        """イニシャライザ."""
+        self._cache = cache
+        self._repository = repository
+
+    def task_saved(self, task: HarmonyTask, previous_version: str | None, version: str | None) -> None:
+        """保存された課題を派生データに反映する."""
+        self._cache.apply(self._repository, previous_version, version, lambda value: value.task_saved(task))
+
+    def task_deleted(self, task_id: str, previous_version: str | None, version: str | None) -> None:
+        """削除された課題を派生データから取り除く."""
+        self._cache.apply(self._repository, previous_version, version, lambda value: value.task_deleted(task_id))
@@ -0,0 +1,312 @@
+"""与えられた声部の旋律パターン検索用索引.
+
+各課題の与えられた声部(バス課題ならバス、ソプラノ課題ならソプラノ)を
+半音単位の音程列に変換し、長さ1から `max_gram` までのn-gramを転置索引に登録する.
+音程列で検索するため、移調しても同じパターンとして検出される.
+
+調号を持つ譜例は、各音を主音からの半音数(0から11)に変換した音度列も別の転置索引に
+登録し、音度のパターン(例: 5,4,3,2,1)でも検索できるようにする. 調号を持たない譜例は
+音度では検索できない.
+"""
+
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from itertools import pairwise
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from models.harmony_task_model import HarmonyTask
+from services.score_parser import ScoreParseError, given_voice_of, parse_score
+
+DEFAULT_MAX_GRAM = 4
+
+# 長音階の各音度の主音からの半音数. 音度は長音階を基準に、臨時記号で変化させて表す
+_MAJOR_SCALE_OFFSETS = (0, 2, 4, 5, 7, 9, 11)
+_SCALE_DEGREE_PATTERN = re.compile(r"^(#{1,2}|b{1,2})?([1-7])$")
+
+
+class MelodicMatch(BaseModel):
+    """旋律パターンの一致箇所.
+
+    Attributes:
+        task_id (str): 一致した課題のID.
+        position (int): 一致箇所の先頭の音の位置(休符を除いた0始まりの音番号).
+
+    """
+
+    task_id: str
+    position: int
+
+
+def to_intervals(pitches: Sequence[int]) -> tuple[int, ...]:
+    """音高列を隣接音間の音程列(半音数)に変換する.
+
+    Args:
+        pitches: MIDI音番号の列.
+
+    Returns:
+        tuple[int, ...]: 音程列. 上行を正、下行を負とする.
+
+    """
+    return tuple(b - a for a, b in pairwise(pitches))
+
+
+def parse_scale_degree(value: str) -> int:
+    """音度を主音からの半音数に変換する.
+
+    音度は長音階を基準とし、"b3"(短3度)や "#4"(増4度)のように臨時記号で変化させて表す.
+    短調の課題でも基準は変わらないため、短調の第3音は "b3" と表す.
+
+    Args:
+        value: 音度(1から7、臨時記号 "#" / "b" を前に付けてもよい).
+
+    Returns:
+        int: 主音からの半音数(0から11).
+
+    Raises:
+        ValueError: 音度として解釈できない場合.
+
+    """
+    match = _SCALE_DEGREE_PATTERN.match(value.strip())
+    if match is None:
+        msg = f"Invalid scale degree: {value!r}"
+        raise ValueError(msg)
+    accidental, degree = match.groups()
+    alter = 0 if accidental is None else len(accidental) * (1 if accidental[0] == "#" else -1)
+    return (_MAJOR_SCALE_OFFSETS[int(degree) - 1] + alter) % 12
+
+
+def tonic_pitch_class(key_fifths: int, mode: str | None = None) -> int:
+    """調号と旋法から主音の音高クラスを求める.
+
+    Args:
+        key_fifths: 調号(シャープを正、フラットを負とする数).
+        mode: 旋法. "minor" の場合は平行短調の主音を返し、それ以外は長調として扱う.
+
+    Returns:
+        int: 主音の音高クラス(Cを0とする).
+
+    """
+    tonic = key_fifths * 7 % 12
+    return (tonic + 9) % 12 if mode == "minor" else tonic
+
+
+def to_scale_degrees(pitches: Sequence[int], tonic: int) -> tuple[int, ...]:
+    """音高列を主音からの半音数の列に変換する.
+
+    Args:
+        pitches: MIDI音番号の列.
+        tonic: 主音の音高クラス.
+
+    Returns:
+        tuple[int, ...]: 主音からの半音数(0から11)の列.
+
+    """
+    return tuple((pitch - tonic) % 12 for pitch in pitches)
+
+
+class _NgramPostings:
+    """整数列のn-gram転置索引. 課題ごとに登録した列も保持する."""
+
+    def __init__(self, max_gram: int) -> None:
+        self.max_gram = max_gram
+        self.postings: dict[tuple[int, ...], list[tuple[str, int]]] = defaultdict(list)
+        self.sequences: dict[str, tuple[int, ...]] = {}
+
+    def add(self, task_id: str, sequence: tuple[int, ...]) -> None:
+        """列を登録する. 登録済みの場合は置き換える."""
+        self.remove(task_id)
+        self.sequences[task_id] = sequence
+        for n in range(1, self.max_gram + 1):
+            for position in range(len(sequence) - n + 1):
+                self.postings[sequence[position : position + n]].append((task_id, position))
+
+    def remove(self, task_id: str) -> None:
+        """列を削除する. 未登録の場合は何もしない."""
+        sequence = self.sequences.pop(task_id, None)
+        if sequence is None:
+            return
+        for n in range(1, self.max_gram + 1):
+            for position in range(len(sequence) - n + 1):
+                gram = sequence[position : position + n]
+                remaining = [posting for posting in self.postings[gram] if posting[0] != task_id]
+                if remaining:
+                    self.postings[gram] = remaining
+                else:
+                    del self.postings[gram]
+
+    def search(self, pattern: tuple[int, ...]) -> list[tuple[str, int]]:
+        """パターンを含む課題IDと位置の組を返す(順序は不定).
+
+        パターンが `max_gram` より長い場合は、パターン内で最も出現数の少ない
+        n-gramから候補を絞り込み、保持している列で照合する.
+        """
+        if len(pattern) <= self.max_gram:
+            return list(self.postings.get(pattern, ()))
+        n = self.max_gram
+        offset = min(
+            range(len(pattern) - n + 1),
+            key=lambda i: len(self.postings.get(pattern[i : i + n], ())),
+        )
+        hits = []
+        for task_id, position in self.postings.get(pattern[offset : offset + n], ()):
+            start = position - offset
+            if start >= 0 and self.sequences[task_id][start : start + len(pattern)] == pattern:
+                hits.append((task_id, start))
+        return hits
+
+
+class MelodicPatternIndex:
+    """音程列と音度列のn-gram転置索引.
+
+    Attributes:
+        max_gram (int): 索引に登録するn-gramの最大長.
+
+    """
+
+    def __init__(self, max_gram: int = DEFAULT_MAX_GRAM, asset_dir: Path | None = None) -> None:
+        """イニシャライザ.
+
+        Args:
+            max_gram: 索引に登録するn-gramの最大長.
+            asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+
+        Raises:
+            ValueError: max_gramが1未満の場合.
+
+        """
+        if max_gram < 1:
+            msg = "max_gram must be positive"
+            raise ValueError(msg)
+        self.max_gram = max_gram
+        self.asset_dir = asset_dir
+        self._intervals = _NgramPostings(max_gram)
+        self._degrees = _NgramPostings(max_gram)
+        self._order: dict[str, int] = {}
+
+    @classmethod
+    def from_tasks(
+        cls,
+        tasks: Iterable[HarmonyTask],
+        asset_dir: Path | None = None,
+        max_gram: int = DEFAULT_MAX_GRAM,
+    ) -> "MelodicPatternIndex":
+        """課題一覧から索引を構築する.
+
+        譜例を解析できない課題(画像形式など)は索引に含めない.
+
+        Args:
+            tasks: 索引に登録する課題.
+            asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+            max_gram: 索引に登録するn-gramの最大長.
+
+        Returns:
+            MelodicPatternIndex: 構築済みの索引.
+
+        """
+        index = cls(max_gram, asset_dir)
+        for task in tasks:
+            index.task_saved(task)
+        return index
+
+    def __len__(self) -> int:
+        """索引に登録されている課題数."""
+        return len(self._intervals.sequences)
+
+    def __contains__(self, task_id: object) -> bool:
+        """指定IDの課題が索引に登録されているか."""
+        return task_id in self._intervals.sequences
+
+    def task_saved(self, task: HarmonyTask) -> None:
+        """課題の譜例を解析して索引に登録する. 解析できない場合は索引から除く.
+
+        Args:
+            task: 保存された課題.
+
+        """
+        try:
+            parsed = parse_score(task.score, self.asset_dir)
+        except ScoreParseError:
+            self.remove(task.id)
+            return
+        tonic = None if parsed.key_fifths is None else tonic_pitch_class(parsed.key_fifths, parsed.mode)
+        self.add(task.id, parsed.given_line(given_voice_of(task)), tonic)
+
+    def task_deleted(self, task_id: str) -> None:
+        """削除された課題を索引から除く.
+
+        Args:
+            task_id: 削除された課題のID.
+
+        """
+        self.remove(task_id)
+
+    def add(self, task_id: str, pitches: Sequence[int], tonic: int | None = None) -> None:
+        """課題の与えられた声部を索引に登録する. 登録済みの場合は置き換える.
+
+        Args:
+            task_id: 課題ID.
+            pitches: 与えられた声部の音高列.
+            tonic: 主音の音高クラス. 指定した場合は音度列も登録する.
+
+        """
+        self.remove(task_id)
+        self._intervals.add(task_id, to_intervals(pitches))
+        if tonic is not None:
+            self._degrees.add(task_id, to_scale_degrees(pitches, tonic))
+        self._order.setdefault(task_id, len(self._order))
+
+    def remove(self, task_id: str) -> None:
+        """課題を索引から削除する. 未登録の場合は何もしない.
+
+        Args:
+            task_id: 課題ID.
+
+        """
+        self._intervals.remove(task_id)
+        self._degrees.remove(task_id)
+
+    def search(self, intervals: Sequence[int]) -> list[MelodicMatch]:
+        """音程列を含む課題と位置を検索する.
+
+        Args:
+            intervals: 検索する音程列(半音数).
+
+        Returns:
+            list[MelodicMatch]: 一致箇所のリスト(課題の登録順、位置の昇順).
+
+        Raises:
+            ValueError: 音程列が空の場合.
+
+        """
+        pattern = tuple(intervals)
+        if not pattern:
+            msg = "pattern must contain at least one interval"
+            raise ValueError(msg)
+        return self._matches(self._intervals.search(pattern))
+
+    def search_scale_degrees(self, degrees: Sequence[int]) -> list[MelodicMatch]:
+        """音度列を含む課題と位置を検索する. 調号を持たない課題は対象外.
+
+        Args:
+            degrees: 検索する音度列(主音からの半音数. `parse_scale_degree()` で求める).
+
+        Returns:
+            list[MelodicMatch]: 一致箇所のリスト(課題の登録順、位置の昇順).
+
+        Raises:
+            ValueError: 音度列が空の場合.
+
+        """
+        pattern = tuple(degree % 12 for degree in degrees)
+        if not pattern:
+            msg = "pattern must contain at least one scale degree"
+            raise ValueError(msg)
+        return self._matches(self._degrees.search(pattern))
+
+    def _matches(self, hits: list[tuple[str, int]]) -> list[MelodicMatch]:
+        """課題IDと位置の組を課題の登録順、位置の昇順に並べる."""
+        hits.sort(key=lambda hit: (self._order[hit[0]], hit[1]))
+        return [MelodicMatch(task_id=task_id, position=position) for task_id, position in hits]
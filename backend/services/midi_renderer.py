@@ -0,0 +1,111 @@
+"""解析済みの譜例をStandard MIDI Fileに変換するモジュール.
+
+声部ごとに1トラック(チャンネル)を割り当てたフォーマット1のSMFを生成する.
+テンポは一定とし、先頭のコンダクタートラックに記録する.
+"""
+
+import hashlib
+import struct
+
+from services.score_parser import ParsedScore
+
+# 出力形式を変更した場合は更新し、キャッシュ済みのMIDIを無効にする
+RENDERER_VERSION = "1"
+
+DEFAULT_TEMPO = 90
+TICKS_PER_QUARTER = 480
+_VELOCITY = 80
+_MAX_CHANNELS = 16
+_MIDI_PITCH_RANGE = range(128)
+_KEY_SIGNATURE_RANGE = range(-7, 8)
+# SMFの可変長数値で表せるデルタタイムの最大値
+_MAX_DELTA_TICKS = 0x0FFFFFFF
+
+
+def render_midi(score: ParsedScore, tempo: int = DEFAULT_TEMPO) -> bytes:
+    """譜例をStandard MIDI File(フォーマット1)のバイト列に変換する.
+
+    Args:
+        score: 解析済みの譜例.
+        tempo: 四分音符を1拍とするテンポ(BPM).
+
+    Returns:
+        bytes: SMFのバイト列.
+
+    Raises:
+        ValueError: テンポが正でない場合.
+
+    """
+    if tempo <= 0:
+        msg = "tempo must be positive"
+        raise ValueError(msg)
+    conductor = _meta_event(0x51, (60_000_000 // tempo).to_bytes(3, "big"))
+    if score.key_fifths in _KEY_SIGNATURE_RANGE:
+        conductor += _meta_event(0x59, struct.pack(">bB", score.key_fifths, int(score.mode == "minor")))
+    tracks = [conductor]
+    for channel, part in enumerate(score.parts[:_MAX_CHANNELS]):
+        events = bytearray()
+        rest_ticks = 0
+        for note in part.notes:
+            # 不正な音価でもSMFとして書けるよう、表せる範囲に丸める
+            ticks = min(max(0, round(note.duration * TICKS_PER_QUARTER)), _MAX_DELTA_TICKS)
+            if note.pitch is None or note.pitch not in _MIDI_PITCH_RANGE:
+                rest_ticks += ticks
+                continue
+            rest_ticks = min(rest_ticks, _MAX_DELTA_TICKS)
+            events += _variable_length(rest_ticks) + bytes((0x90 | channel, note.pitch, _VELOCITY))
+            events += _variable_length(ticks) + bytes((0x80 | channel, note.pitch, 0))
+            rest_ticks = 0
+        tracks.append(bytes(events))
+
+    header = b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), TICKS_PER_QUARTER)
+    body = b"".join(_track_chunk(track) for track in tracks)
+    return header + body
+
+
+def content_hash(score_type: str, score_data: str, tempo: int = DEFAULT_TEMPO) -> str:
+    """MIDIの内容を一意に表すハッシュを計算する. キャッシュのキーとETagに用いる.
+
+    Args:
+        score_type: 譜例データのタイプ.
+        score_data: 譜例データの本体(`read_score_data()` の結果).
+        tempo: テンポ(BPM).
+
+    Returns:
+        str: SHA-256の16進表記.
+
+    """
+    digest = hashlib.sha256()
+    for part in (RENDERER_VERSION, score_type, str(tempo), score_data):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _track_chunk(events: bytes) -> bytes:
+    """イベント列に終端イベントを付けてトラックチャンクにする."""
+    data = events + _meta_event(0x2F, b"")
+    return b"MTrk" + struct.pack(">I", len(data)) + data
+
+
+def _meta_event(kind: int, data: bytes) -> bytes:
+    """デルタタイム0のメタイベントを作成する."""
+    return b"\x00\xff" + bytes((kind,)) + _variable_length(len(data)) + data
+
+
+def _variable_length(value: int) -> bytes:
+    """SMFの可変長数値表現に変換する.
+
+    Raises:
+        ValueError: 値が0から `_MAX_DELTA_TICKS` の範囲外の場合.
+
+    """
+    if not 0 <= value <= _MAX_DELTA_TICKS:
+        msg = f"Value out of range for a variable-length quantity: {value}"
+        raise ValueError(msg)
+    buffer = [value & 0x7F]
+    value >>= 7
+    while value:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(buffer))
@@ -0,0 +1,466 @@
+"""課題の実施(模範解答)を生成するソルバー.
+
+与えられた声部(バスまたはソプラノ)の各音に対し、調の固有和音から候補となる
+四声体の配置を声部の音域内で列挙し、禁則に基づく遷移コストを用いた
+ビーム付きk-best Viterbi探索で、コストの低い実施を上位N件求める.
+
+- 禁止: 連続1・8度、連続5度(いずれも全声部間)
+- 減点: 外声の並達5・8度、声部の交差・超越、大きな跳躍、導音の未解決、
+  第3音の重複、弱進行(D→SD)、同一和音の連続
+
+遷移コストは配置の組ごとにメモ化するため、同じ音型が繰り返される課題でも
+評価は一度で済む. 探索は時間上限を超えるとビーム幅を縮めて打ち切りを早める.
+"""
+
+import heapq
+import json
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from models.harmony_task_model import Answer, AnswerType, HarmonyTask
+from services.score_parser import GivenVoice, ScoreParseError, given_voice_of, parse_score
+
+# 声部の音域(MIDI音番号). 上声から順にソプラノ、アルト、テノール、バス
+VOICE_RANGES = ((60, 79), (55, 74), (48, 67), (40, 60))
+VOICE_NAMES = ("soprano", "alto", "tenor", "bass")
+SOPRANO, ALTO, TENOR, BASS = range(4)
+
+DEFAULT_RESULTS = 3
+DEFAULT_BEAM_WIDTH = 48
+DEFAULT_TIME_BUDGET = 0.5
+
+_FORBIDDEN = float("inf")
+_MAX_ADJACENT_SPACING = 12
+_MAX_BASS_SPACING = 24
+_STEP = 2
+_TRITONE = 6
+_PERFECT_FIFTH = 7
+_OCTAVE = 12
+
+# 長調・短調(和声的短音階)の固有三和音: (和音名, 機能, 根音・第3音・第5音の主音からの半音数)
+_MAJOR_CHORDS = (
+    ("I", "T", (0, 4, 7)),
+    ("ii", "SD", (2, 5, 9)),
+    ("IV", "SD", (5, 9, 0)),
+    ("V", "D", (7, 11, 2)),
+    ("vi", "T", (9, 0, 4)),
+)
+_MINOR_CHORDS = (
+    ("i", "T", (0, 3, 7)),
+    ("ii°", "SD", (2, 5, 8)),
+    ("iv", "SD", (5, 8, 0)),
+    ("V", "D", (7, 11, 2)),
+    ("VI", "T", (8, 0, 3)),
+)
+
+
+class RealizationError(Exception):
+    """実施を生成できない場合の例外."""
+
+
+@dataclass(frozen=True)
+class Chord:
+    """調の中での和音.
+
+    Attributes:
+        name (str): 和音記号(例: "V").
+        function (str): 和音機能("T" / "SD" / "D").
+        pitch_classes (tuple[int, int, int]): 根音・第3音・第5音のピッチクラス.
+        leading_tone (int): 調の導音のピッチクラス.
+
+    """
+
+    name: str
+    function: str
+    pitch_classes: tuple[int, int, int]
+    leading_tone: int
+
+    @property
+    def root(self) -> int:
+        """根音のピッチクラス."""
+        return self.pitch_classes[0]
+
+    @property
+    def third(self) -> int:
+        """第3音のピッチクラス."""
+        return self.pitch_classes[1]
+
+
+@dataclass(frozen=True)
+class Voicing:
+    """四声体の配置.
+
+    Attributes:
+        chord (Chord): 和音.
+        pitches (tuple[int, int, int, int]): ソプラノ、アルト、テノール、バスの音高.
+
+    """
+
+    chord: Chord
+    pitches: tuple[int, int, int, int]
+
+
+@dataclass(frozen=True)
+class _PathNode:
+    """探索中の経路. 親経路をたどると先頭の配置まで戻れる連結リスト."""
+
+    cost: float
+    voicing: Voicing
+    parent: "_PathNode | None"
+
+
+class Realization(BaseModel):
+    """生成された実施.
+
+    Attributes:
+        soprano (list[int]): ソプラノの音高列.
+        alto (list[int]): アルトの音高列.
+        tenor (list[int]): テノールの音高列.
+        bass (list[int]): バスの音高列.
+        chords (list[str]): 和音記号の列.
+        functions (list[str]): 和音機能の列.
+        cost (float): 禁則・減点に基づくコスト(低いほど良い).
+
+    """
+
+    soprano: list[int]
+    alto: list[int]
+    tenor: list[int]
+    bass: list[int]
+    chords: list[str]
+    functions: list[str]
+    cost: float
+
+    def to_answer(self, key_fifths: int = 0, mode: str = "major") -> Answer:
+        """課題の `answer` に登録できるJSON形式の解答データに変換する.
+
+        Args:
+            key_fifths: 調号.
+            mode: 旋法.
+
+        Returns:
+            Answer: JSON形式の解答データ.
+
+        """
+        data = {
+            "key": key_fifths,
+            "mode": mode,
+            "functions": self.functions,
+            "parts": [{"voice": name, "notes": getattr(self, name)} for name in VOICE_NAMES],
+        }
+        return Answer(type=AnswerType.json, data=json.dumps(data, ensure_ascii=False))
+
+
+def diatonic_chords(key_fifths: int = 0, mode: str | None = "major") -> tuple[Chord, ...]:
+    """調の固有三和音を返す. 短調は和声的短音階を用いる.
+
+    Args:
+        key_fifths: 調号(シャープを正、フラットを負とする数).
+        mode: 旋法. "minor" 以外は長調として扱う.
+
+    Returns:
+        tuple[Chord, ...]: 固有三和音.
+
+    """
+    minor = mode == "minor"
+    tonic = (key_fifths * _PERFECT_FIFTH + (9 if minor else 0)) % 12
+    table = _MINOR_CHORDS if minor else _MAJOR_CHORDS
+    leading_tone = (tonic + 11) % 12
+    return tuple(
+        Chord(name, function, ((tonic + root) % 12, (tonic + third) % 12, (tonic + fifth) % 12), leading_tone)
+        for name, function, (root, third, fifth) in table
+    )
+
+
+class RealizationSolver:
+    """与えられた声部から四声体の実施を探索するソルバー.
+
+    Attributes:
+        chords (tuple[Chord, ...]): 候補とする和音.
+
+    """
+
+    def __init__(self, key_fifths: int = 0, mode: str | None = "major") -> None:
+        """イニシャライザ.
+
+        Args:
+            key_fifths: 調号.
+            mode: 旋法.
+
+        """
+        self.chords = diatonic_chords(key_fifths, mode)
+        self._voicing_cache: dict[tuple[int, GivenVoice], tuple[Voicing, ...]] = {}
+        self._transition_cache: dict[tuple[Voicing, Voicing], float] = {}
+        self._static_cache: dict[Voicing, float] = {}
+
+    def solve(
+        self,
+        given: Sequence[int],
+        voice: GivenVoice,
+        n_results: int = DEFAULT_RESULTS,
+        beam_width: int = DEFAULT_BEAM_WIDTH,
+        time_budget: float = DEFAULT_TIME_BUDGET,
+    ) -> list[Realization]:
+        """コストの低い実施を上位N件求める.
+
+        Args:
+            given: 与えられた声部の音高列.
+            voice: 与えられた声部.
+            n_results: 返す実施の件数.
+            beam_width: 各音で保持する配置の数.
+            time_budget: 探索の時間上限(秒). 超過後はビーム幅をN件まで縮める.
+
+        Returns:
+            list[Realization]: コストの昇順に並んだ実施. 禁則を避けられない場合は空.
+
+        Raises:
+            RealizationError: 候補となる和音が無い音が含まれる場合.
+
+        """
+        if not given:
+            return []
+        deadline = time.perf_counter() + time_budget
+        last = len(given) - 1
+
+        # 各状態(配置)ごとに、そこで終わる経路をコストの低い順に最大N件保持する
+        frontier: dict[Voicing, list[_PathNode]] = {}
+        for voicing in self._candidates(given[0], voice):
+            cost = self._static_cost(voicing, 0, last)
+            if cost != _FORBIDDEN:
+                frontier[voicing] = [_PathNode(cost, voicing, None)]
+
+        for slot in range(1, len(given)):
+            width = beam_width if time.perf_counter() < deadline else n_results
+            survivors = heapq.nsmallest(width, frontier.items(), key=lambda item: item[1][0].cost)
+            next_frontier: dict[Voicing, list[_PathNode]] = {}
+            for voicing in self._candidates(given[slot], voice):
+                static = self._static_cost(voicing, slot, last)
+                if static == _FORBIDDEN:
+                    continue
+                paths: list[_PathNode] = []
+                for previous, previous_paths in survivors:
+                    transition = self._transition_cost(previous, voicing)
+                    if transition == _FORBIDDEN:
+                        continue
+                    paths.extend(_PathNode(path.cost + transition + static, voicing, path) for path in previous_paths)
+                if paths:
+                    next_frontier[voicing] = heapq.nsmallest(n_results, paths, key=lambda path: path.cost)
+            frontier = next_frontier
+
+        finals = heapq.nsmallest(
+            n_results,
+            (path for paths in frontier.values() for path in paths),
+            key=lambda path: path.cost,
+        )
+        return [self._to_realization(path) for path in finals]
+
+    def _candidates(self, pitch: int, voice: GivenVoice) -> tuple[Voicing, ...]:
+        """与えられた音を含む配置を列挙する."""
+        key = (pitch, voice)
+        cached = self._voicing_cache.get(key)
+        if cached is not None:
+            return cached
+
+        fixed = BASS if voice == GivenVoice.bass else SOPRANO
+        voicings: list[Voicing] = []
+        for chord in self.chords:
+            # バスに置けるのは根音(基本形)と第3音(第1転回形)のみ
+            bass_pitch_classes = (chord.root, chord.third)
+            if pitch % 12 in (bass_pitch_classes if fixed == BASS else chord.pitch_classes):
+                voicings.extend(self._chord_voicings(chord, fixed, pitch))
+
+        if not voicings:
+            msg = f"No chord candidates for pitch {pitch}"
+            raise RealizationError(msg)
+        result = tuple(voicings)
+        self._voicing_cache[key] = result
+        return result
+
+    def _chord_voicings(self, chord: Chord, fixed: int, pitch: int) -> list[Voicing]:
+        """与えられた声部を固定し、和音の配置を音域内で列挙する."""
+        options: list[tuple[int, ...]] = []
+        for index, (low, high) in enumerate(VOICE_RANGES):
+            allowed = (chord.root, chord.third) if index == BASS else chord.pitch_classes
+            options.append((pitch,) if index == fixed else tuple(p for p in range(low, high + 1) if p % 12 in allowed))
+        voicings = []
+        for soprano, alto, tenor, bass in product(*options):
+            pitches = (soprano, alto, tenor, bass)
+            if self._is_valid_spacing(pitches) and {chord.root, chord.third} <= {p % 12 for p in pitches}:
+                voicings.append(Voicing(chord, pitches))
+        return voicings
+
+    @staticmethod
+    def _is_valid_spacing(pitches: tuple[int, int, int, int]) -> bool:
+        """声部の順序と間隔が適切か."""
+        soprano, alto, tenor, bass = pitches
+        return (
+            soprano > alto > tenor > bass
+            and soprano - alto <= _MAX_ADJACENT_SPACING
+            and alto - tenor <= _MAX_ADJACENT_SPACING
+            and tenor - bass <= _MAX_BASS_SPACING
+        )
+
+    def _static_cost(self, voicing: Voicing, slot: int, last: int) -> float:
+        """配置単体のコスト(重複・転回・開始/終止)."""
+        base = self._static_cache.get(voicing)
+        if base is None:
+            base = self._voicing_cost(voicing)
+            self._static_cache[voicing] = base
+        chord = voicing.chord
+        # 開始・終止は主和音の基本形とする
+        if slot in (0, last) and (chord != self.chords[0] or voicing.pitches[BASS] % 12 != chord.root):
+            base += 6
+        if slot == last and voicing.pitches[SOPRANO] % 12 != chord.root:
+            base += 2
+        return base
+
+    @staticmethod
+    def _voicing_cost(voicing: Voicing) -> float:
+        """重複と転回に基づく配置のコスト."""
+        chord = voicing.chord
+        pitch_classes = [p % 12 for p in voicing.pitches]
+        if pitch_classes.count(chord.leading_tone) > 1:
+            return _FORBIDDEN
+        cost = 0.0
+        if pitch_classes.count(chord.third) > 1:
+            cost += 3
+        if chord.pitch_classes[2] not in pitch_classes:
+            cost += 2
+        if pitch_classes[BASS] != chord.root:
+            cost += 1
+        if "°" in chord.name and pitch_classes[BASS] == chord.root:
+            return _FORBIDDEN
+        return cost
+
+    def _transition_cost(self, previous: Voicing, current: Voicing) -> float:
+        """配置間の遷移コスト. 組ごとにメモ化する."""
+        key = (previous, current)
+        cached = self._transition_cache.get(key)
+        if cached is None:
+            cached = self._score_transition(previous, current)
+            self._transition_cache[key] = cached
+        return cached
+
+    @classmethod
+    def _score_transition(cls, previous: Voicing, current: Voicing) -> float:
+        """禁則・減点規則に基づいて遷移コストを計算する."""
+        before, after = previous.pitches, current.pitches
+        if cls._has_parallel_perfect(before, after):
+            return _FORBIDDEN
+        cost = cls._motion_cost(before, after)
+
+        # 外声の並達5・8度は、ソプラノが跳躍して同方向から完全音程に入る場合に減点する
+        soprano_motion = after[SOPRANO] - before[SOPRANO]
+        bass_motion = after[BASS] - before[BASS]
+        outer = (after[SOPRANO] - after[BASS]) % 12
+        if soprano_motion * bass_motion > 0 and outer in (0, _PERFECT_FIFTH) and abs(soprano_motion) > _STEP:
+            cost += 5
+
+        # 導音はソプラノで主音へ解決させる
+        chord = previous.chord
+        if (
+            chord.function == "D"
+            and before[SOPRANO] % 12 == chord.leading_tone
+            and after[SOPRANO] != before[SOPRANO] + 1
+            and current.chord.function == "T"
+        ):
+            cost += 4
+
+        if chord.function == "D" and current.chord.function == "SD":
+            cost += 3
+        if chord == current.chord:
+            cost += 1
+        return cost
+
+    @staticmethod
+    def _has_parallel_perfect(before: tuple[int, ...], after: tuple[int, ...]) -> bool:
+        """いずれかの声部間に連続1・8度または連続5度があるか."""
+        for upper in range(4):
+            for lower in range(upper + 1, 4):
+                old = (before[upper] - before[lower]) % 12
+                new = (after[upper] - after[lower]) % 12
+                moved = before[upper] != after[upper] and before[lower] != after[lower]
+                if moved and old == new and new in (0, _PERFECT_FIFTH):
+                    return True
+        return False
+
+    @staticmethod
+    def _motion_cost(before: tuple[int, ...], after: tuple[int, ...]) -> float:
+        """各声部の進行(跳躍・超越)のコスト."""
+        cost = 0.0
+        for index in range(4):
+            motion = abs(after[index] - before[index])
+            # 隣接声部の直前の音を越えて進む超越を減点する
+            if index > 0 and after[index] > before[index - 1]:
+                cost += 3
+            if index < BASS and after[index] < before[index + 1]:
+                cost += 3
+            if index == BASS:
+                # バスは跳躍が自然なため、オクターブを超える跳躍のみを強く減点する
+                cost += 0.25 * motion if motion <= _OCTAVE else 3 + motion
+            else:
+                cost += 0.5 * motion if motion <= _PERFECT_FIFTH else 3 + motion
+                cost += 4 if motion == _TRITONE else 0
+        return cost
+
+    @staticmethod
+    def _to_realization(path: _PathNode) -> Realization:
+        """経路の連結リストを実施に変換する."""
+        voicings: list[Voicing] = []
+        node: _PathNode | None = path
+        while node is not None:
+            voicings.append(node.voicing)
+            node = node.parent
+        voicings.reverse()
+        return Realization(
+            soprano=[v.pitches[SOPRANO] for v in voicings],
+            alto=[v.pitches[ALTO] for v in voicings],
+            tenor=[v.pitches[TENOR] for v in voicings],
+            bass=[v.pitches[BASS] for v in voicings],
+            chords=[v.chord.name for v in voicings],
+            functions=[v.chord.function for v in voicings],
+            cost=path.cost,
+        )
+
+
+def realize_task(
+    task: HarmonyTask,
+    asset_dir: Path | None = None,
+    n_results: int = DEFAULT_RESULTS,
+    time_budget: float = DEFAULT_TIME_BUDGET,
+) -> list[Realization]:
+    """課題の譜例から実施を生成する.
+
+    Args:
+        task: 和声課題.
+        asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+        n_results: 返す実施の件数.
+        time_budget: 探索の時間上限(秒).
+
+    Returns:
+        list[Realization]: コストの昇順に並んだ実施.
+
+    Raises:
+        RealizationError: 譜例を解析できない、または与えられた声部を判定できない場合.
+
+    """
+    try:
+        parsed = parse_score(task.score, asset_dir)
+    except ScoreParseError as e:
+        msg = f"Failed to parse score: {e!s}"
+        raise RealizationError(msg) from e
+
+    voice = given_voice_of(task)
+    if voice is None and len(parsed.parts) == 1:
+        voice = parsed.parts[0].voice
+    if voice is None:
+        msg = "Cannot determine the given voice"
+        raise RealizationError(msg)
+
+    solver = RealizationSolver(parsed.key_fifths or 0, parsed.mode)
+    return solver.solve(parsed.given_line(voice), voice, n_results=n_results, time_budget=time_budget)
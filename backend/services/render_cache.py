@@ -0,0 +1,123 @@
+"""レンダリング結果をディスクに保存するキャッシュ.
+
+内容ハッシュをファイル名としてバイト列を保存し、合計サイズが上限を超えた場合は
+最後に利用された時刻(更新時刻)の古いものから削除する.
+"""
+
+import os
+import re
+from collections.abc import Callable
+from contextlib import suppress
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{16,128}$")
+
+
+class RenderCache:
+    """内容ハッシュをキーとするサイズ上限付きのディスクキャッシュ.
+
+    Attributes:
+        directory (Path): キャッシュファイルを保存するディレクトリ.
+        max_bytes (int): キャッシュファイルの合計サイズの上限.
+        suffix (str): キャッシュファイルの拡張子.
+
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES, suffix: str = ".bin") -> None:
+        """イニシャライザ.
+
+        Args:
+            directory: キャッシュファイルを保存するディレクトリ.
+            max_bytes: キャッシュファイルの合計サイズの上限.
+            suffix: キャッシュファイルの拡張子.
+
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+    def get(self, key: str) -> bytes | None:
+        """キャッシュ済みのバイト列を取得する. 取得したファイルは最近利用したものとして扱う.
+
+        Args:
+            key: 内容ハッシュ.
+
+        Returns:
+            bytes | None: キャッシュ済みのバイト列. 無い場合はNone.
+
+        """
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """バイト列を保存し、上限を超えた分を古いものから削除する.
+
+        Args:
+            key: 内容ハッシュ.
+            data: 保存するバイト列.
+
+        Raises:
+            OSError: ファイルの保存に失敗した場合.
+
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+        self._evict(keep=path)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """キャッシュ済みであれば返し、無ければレンダリングして保存する.
+
+        保存に失敗してもレンダリング結果は返す.
+
+        Args:
+            key: 内容ハッシュ.
+            render: バイト列を生成する関数.
+
+        Returns:
+            bytes: レンダリング結果.
+
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        data = render()
+        with suppress(OSError):
+            self.put(key, data)
+        return data
+
+    def _path(self, key: str) -> Path:
+        """キーに対応するファイルパス. キーはパスとして安全な16進文字列に限る."""
+        if not _KEY_PATTERN.match(key):
+            msg = f"Invalid cache key: {key}"
+            raise ValueError(msg)
+        return self.directory / f"{key}{self.suffix}"
+
+    def _evict(self, keep: Path) -> None:
+        """合計サイズが上限以下になるまで、利用時刻の古いファイルから削除する."""
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,391 @@
+"""譜例データの解析モジュール.
+
+`Score`/`Answer` に格納された MusicXML または JSON 形式の譜例を解析し、
+声部ごとの音列(MIDI音番号と音価)を取り出す.
+
+JSON形式の譜例は次の構造を想定する::
+
+    {
+        "key": 0,                      # 調号(五度圏上の位置, 任意)
+        "mode": "major",               # 旋法(任意)
+        "functions": ["T", "D", "T"],  # 和音機能(任意)
+        "parts": [
+            {"voice": "bass", "notes": ["C3", {"pitch": "G2", "duration": 2}, null]}
+        ]
+    }
+
+`parts` の代わりに単一声部の `notes` を直接記述してもよい.
+音は音名(例: "C#4", "Bb3")またはMIDI音番号で表し、`null` は休符を表す.
+"""
+
+import json
+import math
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+from models.harmony_task_model import Answer, AnswerType, HarmonyTask, Score, ScoreType
+
+_STEP_TO_PITCH_CLASS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+_PITCH_NAME_PATTERN = re.compile(r"^([A-Ga-g])(#{1,2}|b{1,2}|x)?(-?\d+)$")
+_ACCIDENTAL_TO_ALTER = {None: 0, "#": 1, "##": 2, "x": 2, "b": -1, "bb": -2}
+
+
+class ScoreParseError(Exception):
+    """譜例データを解析できない場合の例外."""
+
+
+class GivenVoice(str, Enum):
+    """課題として与えられる声部."""
+
+    bass = "bass"
+    soprano = "soprano"
+
+
+# 課題の種類を表すタグと与えられる声部の対応
+_VOICE_TAGS = {
+    "バス課題": GivenVoice.bass,
+    "ソプラノ課題": GivenVoice.soprano,
+}
+
+
+@dataclass(frozen=True)
+class Note:
+    """解析済みの音.
+
+    Attributes:
+        pitch (int | None): MIDI音番号. 休符の場合はNone.
+        duration (float): 四分音符を1とした音価.
+
+    """
+
+    pitch: int | None
+    duration: float = 1.0
+
+
+@dataclass(frozen=True)
+class Part:
+    """解析済みの声部.
+
+    Attributes:
+        notes (tuple[Note, ...]): 声部の音列.
+        voice (GivenVoice | None): 声部名が判別できる場合の声部.
+
+    """
+
+    notes: tuple[Note, ...]
+    voice: GivenVoice | None = None
+
+    @property
+    def pitches(self) -> tuple[int, ...]:
+        """休符を除いた音高列."""
+        return tuple(note.pitch for note in self.notes if note.pitch is not None)
+
+
+@dataclass(frozen=True)
+class ParsedScore:
+    """解析済みの譜例.
+
+    Attributes:
+        parts (tuple[Part, ...]): 上声から順に並んだ声部.
+        key_fifths (int | None): 調号(シャープを正、フラットを負とする数).
+        mode (str | None): 旋法("major" / "minor" など).
+        functions (tuple[str, ...]): 和音機能の列("T", "D", "SD" など).
+
+    """
+
+    parts: tuple[Part, ...]
+    key_fifths: int | None = None
+    mode: str | None = None
+    functions: tuple[str, ...] = ()
+
+    def given_line(self, voice: GivenVoice | None = None) -> tuple[int, ...]:
+        """課題として与えられた声部の音高列を返す.
+
+        声部名が一致するパートがあればそれを、なければバス課題は最下声、
+        ソプラノ課題および不明な場合は最上声を返す.
+
+        Args:
+            voice: 課題として与えられる声部.
+
+        Returns:
+            tuple[int, ...]: 休符を除いた音高列. 声部が無い場合は空.
+
+        """
+        if not self.parts:
+            return ()
+        for part in self.parts:
+            if voice is not None and part.voice == voice:
+                return part.pitches
+        if voice == GivenVoice.bass:
+            return self.parts[-1].pitches
+        return self.parts[0].pitches
+
+
+def given_voice_of(task: HarmonyTask) -> GivenVoice | None:
+    """タグから課題として与えられる声部を判定する.
+
+    Args:
+        task: 和声課題.
+
+    Returns:
+        GivenVoice | None: 判定できた声部. 判定できない場合はNone.
+
+    """
+    for tag in task.tags or []:
+        if tag in _VOICE_TAGS:
+            return _VOICE_TAGS[tag]
+    return None
+
+
+def parse_pitch(value: str | int) -> int:
+    """音名またはMIDI音番号をMIDI音番号に変換する.
+
+    Args:
+        value: 音名(例: "C#4", "Bb3")またはMIDI音番号.
+
+    Returns:
+        int: MIDI音番号.
+
+    Raises:
+        ScoreParseError: 音名として解釈できない場合.
+
+    """
+    if isinstance(value, bool):
+        msg = f"Invalid pitch: {value!r}"
+        raise ScoreParseError(msg)
+    if isinstance(value, int):
+        return value
+    match = _PITCH_NAME_PATTERN.match(str(value).strip())
+    if match is None:
+        msg = f"Invalid pitch: {value!r}"
+        raise ScoreParseError(msg)
+    step, accidental, octave = match.groups()
+    return (int(octave) + 1) * 12 + _STEP_TO_PITCH_CLASS[step.upper()] + _ACCIDENTAL_TO_ALTER[accidental]
+
+
+def parse_score(score: Score | Answer, asset_dir: Path | None = None) -> ParsedScore:
+    """譜例または解答データを解析する.
+
+    Args:
+        score: 解析する譜例または解答データ.
+        asset_dir: データがファイルパスの場合に基準とするディレクトリ.
+
+    Returns:
+        ParsedScore: 解析済みの譜例.
+
+    Raises:
+        ScoreParseError: 未対応の形式、またはデータが不正な場合.
+
+    """
+    return parse_score_data(score.type, read_score_data(score, asset_dir))
+
+
+def read_score_data(score: Score | Answer, asset_dir: Path | None = None) -> str:
+    """譜例または解答データの本体を取得する.
+
+    インラインのデータはそのまま返し、ファイルパスの場合はファイルの内容を読み込む.
+
+    Args:
+        score: 譜例または解答データ.
+        asset_dir: データがファイルパスの場合に基準とするディレクトリ.
+
+    Returns:
+        str: 譜例データの本体.
+
+    Raises:
+        ScoreParseError: 未対応の形式、またはファイルを読み込めない場合.
+
+    """
+    if score.type in (ScoreType.musicxml, AnswerType.musicxml):
+        return _resolve_data(score.data, "<", asset_dir)
+    if score.type in (ScoreType.json, AnswerType.json):
+        return _resolve_data(score.data, "{", asset_dir)
+    msg = f"Unsupported score type: {score.type}"
+    raise ScoreParseError(msg)
+
+
+def parse_score_data(score_type: ScoreType | AnswerType, text: str) -> ParsedScore:
+    """`read_score_data()` で取得した譜例データの本体を解析する.
+
+    Args:
+        score_type: 譜例データのタイプ.
+        text: 譜例データの本体.
+
+    Returns:
+        ParsedScore: 解析済みの譜例.
+
+    Raises:
+        ScoreParseError: 未対応の形式、またはデータが不正な場合.
+
+    """
+    if score_type in (ScoreType.musicxml, AnswerType.musicxml):
+        return _parse_musicxml(text)
+    if score_type in (ScoreType.json, AnswerType.json):
+        return _parse_json(text)
+    msg = f"Unsupported score type: {score_type}"
+    raise ScoreParseError(msg)
+
+
+def _resolve_data(data: str, inline_prefix: str, asset_dir: Path | None) -> str:
+    """インラインのデータはそのまま、パスの場合はファイルの内容を返す."""
+    if data.lstrip().startswith(inline_prefix):
+        return data
+    path = Path(data)
+    if not path.is_absolute() and asset_dir is not None:
+        path = asset_dir / path
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError as e:
+        msg = f"Failed to read score file: {e!s}"
+        raise ScoreParseError(msg) from e
+
+
+def _parse_json(text: str) -> ParsedScore:
+    """JSON形式の譜例を解析する."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        msg = f"Invalid JSON score: {e!s}"
+        raise ScoreParseError(msg) from e
+    if not isinstance(data, dict):
+        msg = "Invalid JSON score: root must be an object"
+        raise ScoreParseError(msg)
+
+    raw_parts = data.get("parts")
+    if raw_parts is None:
+        raw_parts = [{"voice": data.get("voice"), "notes": data.get("notes", [])}]
+    if not isinstance(raw_parts, list):
+        msg = "Invalid JSON score: 'parts' must be an array"
+        raise ScoreParseError(msg)
+
+    parts = tuple(_parse_json_part(raw) for raw in raw_parts)
+    key = data.get("key")
+    mode = data.get("mode")
+    functions = data.get("functions") or []
+    if not isinstance(functions, list):
+        msg = "Invalid JSON score: 'functions' must be an array"
+        raise ScoreParseError(msg)
+    return ParsedScore(
+        parts=parts,
+        key_fifths=key if isinstance(key, int) and not isinstance(key, bool) else None,
+        mode=mode if isinstance(mode, str) else None,
+        functions=tuple(str(f) for f in functions),
+    )
+
+
+def _parse_json_part(raw: object) -> Part:
+    """JSON形式の声部を解析する."""
+    if not isinstance(raw, dict) or not isinstance(raw.get("notes", []), list):
+        msg = "Invalid JSON score: part must be an object with 'notes' array"
+        raise ScoreParseError(msg)
+    notes: list[Note] = []
+    for item in raw.get("notes", []):
+        if item is None:
+            notes.append(Note(pitch=None))
+        elif isinstance(item, dict):
+            pitch = item.get("pitch")
+            notes.append(
+                Note(
+                    pitch=None if pitch is None else parse_pitch(pitch),
+                    duration=_parse_duration(item.get("duration", 1.0)),
+                ),
+            )
+        else:
+            notes.append(Note(pitch=parse_pitch(item)))
+    return Part(notes=tuple(notes), voice=_voice_from_name(raw.get("voice")))
+
+
+def _parse_duration(value: object) -> float:
+    """JSON形式の音価を数値に変換する. 負の値と有限でない値は受け付けない."""
+    if isinstance(value, bool) or not isinstance(value, int | float | str):
+        msg = f"Invalid JSON score: invalid duration {value!r}"
+        raise ScoreParseError(msg)
+    try:
+        duration = float(value)
+    except ValueError as e:
+        msg = f"Invalid JSON score: invalid duration {value!r}"
+        raise ScoreParseError(msg) from e
+    if not math.isfinite(duration) or duration < 0:
+        msg = f"Invalid JSON score: invalid duration {value!r}"
+        raise ScoreParseError(msg)
+    return duration
+
+
+def _voice_from_name(name: object) -> GivenVoice | None:
+    """声部名から声部を判定する."""
+    if not isinstance(name, str):
+        return None
+    lowered = name.strip().lower()
+    for voice in GivenVoice:
+        if lowered.startswith(voice.value):
+            return voice
+    return None
+
+
+def _parse_musicxml(text: str) -> ParsedScore:
+    """MusicXML(score-partwise)形式の譜例を解析する.
+
+    和音(`<chord/>`)の構成音は最初の音のみを採用し、装飾音は無視する.
+    """
+    try:
+        root = ET.fromstring(text)  # noqa: S314 課題データは管理者が登録する信頼済みデータ
+    except ET.ParseError as e:
+        msg = f"Invalid MusicXML: {e!s}"
+        raise ScoreParseError(msg) from e
+
+    part_names = {
+        score_part.get("id"): score_part.findtext("part-name", default="") for score_part in root.iter("score-part")
+    }
+    key_fifths: int | None = None
+    mode: str | None = None
+    parts: list[Part] = []
+
+    try:
+        for part in root.iter("part"):
+            divisions = 1
+            notes: list[Note] = []
+            for measure in part.iter("measure"):
+                for element in measure:
+                    if element.tag == "attributes":
+                        divisions = int(element.findtext("divisions", default=str(divisions)))
+                        fifths = element.findtext("key/fifths")
+                        if fifths is not None and key_fifths is None:
+                            key_fifths = int(fifths)
+                            mode = element.findtext("key/mode")
+                    elif element.tag == "note":
+                        note = _parse_musicxml_note(element, divisions)
+                        if note is not None:
+                            notes.append(note)
+            parts.append(Part(notes=tuple(notes), voice=_voice_from_name(part_names.get(part.get("id")))))
+    except (ValueError, OverflowError, ZeroDivisionError) as e:
+        msg = f"Invalid MusicXML: {e!s}"
+        raise ScoreParseError(msg) from e
+
+    return ParsedScore(parts=tuple(parts), key_fifths=key_fifths, mode=mode)
+
+
+def _parse_musicxml_note(element: ET.Element, divisions: int) -> Note | None:
+    """MusicXMLの`<note>`要素を解析する. 和音の構成音と装飾音はNoneを返す."""
+    if element.find("chord") is not None or element.find("grace") is not None:
+        return None
+    duration = int(element.findtext("duration", default="0")) / divisions
+    if duration < 0:
+        msg = f"Invalid MusicXML: negative duration {duration}"
+        raise ScoreParseError(msg)
+    if element.find("rest") is not None:
+        return Note(pitch=None, duration=duration)
+    step = element.findtext("pitch/step")
+    octave = element.findtext("pitch/octave")
+    if step is None or octave is None:
+        msg = "Invalid MusicXML: note without pitch"
+        raise ScoreParseError(msg)
+    pitch_class = _STEP_TO_PITCH_CLASS.get(step.strip().upper())
+    if pitch_class is None:
+        msg = f"Invalid MusicXML: invalid step {step!r}"
+        raise ScoreParseError(msg)
+    alter = round(float(element.findtext("pitch/alter", default="0")))
+    pitch = (int(octave) + 1) * 12 + pitch_class + alter
+    return Note(pitch=pitch, duration=duration)
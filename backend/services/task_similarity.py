@@ -0,0 +1,393 @@
+"""類似課題推薦のための特徴量ベクトル索引.
+
+各課題を次の特徴量を連結した数値ベクトルに変換し、L2正規化して1つの連続した
+NumPy行列に格納する. 正規化済みのためコサイン類似度は行列とベクトルの積1回で求まる.
+
+- 与えられた声部の音程ヒストグラム(-12〜+12半音)
+- 調(主音のピッチクラスと短調フラグ)
+- 長さ(音数の対数)
+- 和音機能(T / D / SD / その他)の分布
+- 難易度
+- タグ(ハッシュで固定次元に写像)
+
+行列は `.npy` 形式で保存でき、読み込み時はメモリマップするため大規模な課題集でも
+全体をメモリに展開せずに推薦できる.
+"""
+
+import json
+import math
+import os
+import threading
+import uuid
+import zlib
+from collections.abc import Iterable
+from contextlib import suppress
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+from pydantic import BaseModel
+
+from models.harmony_task_model import Difficulty, HarmonyTask
+from repositories.harmony_task_repository import HarmonyTaskRepository
+from services.melodic_pattern_index import to_intervals
+from services.score_parser import ScoreParseError, given_voice_of, parse_score
+
+MAX_INTERVAL = 12
+TAG_BUCKETS = 32
+_MAX_LENGTH = 64
+_FUNCTION_LABELS = ("T", "D", "SD")
+_FUNCTION_ALIASES = {"S": "SD"}
+_DIFFICULTIES = (Difficulty.easy, Difficulty.normal, Difficulty.hard)
+
+# 特徴量ブロックごとの次元数と重み
+_BLOCKS = (
+    ("intervals", 2 * MAX_INTERVAL + 1, 1.0),
+    ("key", 13, 0.5),
+    ("length", 1, 0.5),
+    ("functions", len(_FUNCTION_LABELS) + 1, 0.75),
+    ("difficulty", len(_DIFFICULTIES), 0.75),
+    ("tags", TAG_BUCKETS, 1.0),
+)
+FEATURE_DIM = sum(size for _, size, _ in _BLOCKS)
+
+Matrix = npt.NDArray[np.float32]
+
+
+class SimilarTask(BaseModel):
+    """類似課題.
+
+    Attributes:
+        task_id (str): 類似課題のID.
+        score (float): コサイン類似度.
+
+    """
+
+    task_id: str
+    score: float
+
+
+def extract_features(task: HarmonyTask, asset_dir: Path | None = None) -> npt.NDArray[np.float32]:
+    """課題を正規化済みの特徴量ベクトルに変換する.
+
+    譜例を解析できない課題は、難易度とタグのみから特徴量を作成する.
+
+    Args:
+        task: 変換する課題.
+        asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+
+    Returns:
+        npt.NDArray[np.float32]: 長さ `FEATURE_DIM` のベクトル. 特徴が無い場合は零ベクトル.
+
+    """
+    blocks = {name: np.zeros(size, dtype=np.float32) for name, size, _ in _BLOCKS}
+
+    try:
+        parsed = parse_score(task.score, asset_dir)
+    except ScoreParseError:
+        parsed = None
+    if parsed is not None:
+        pitches = parsed.given_line(given_voice_of(task))
+        for interval in to_intervals(pitches):
+            blocks["intervals"][max(-MAX_INTERVAL, min(MAX_INTERVAL, interval)) + MAX_INTERVAL] += 1
+        if parsed.key_fifths is not None:
+            minor = parsed.mode == "minor"
+            tonic = (parsed.key_fifths * 7 + (9 if minor else 0)) % 12
+            blocks["key"][tonic] = 1
+            blocks["key"][12] = float(minor)
+        if pitches:
+            blocks["length"][0] = min(1.0, math.log1p(len(pitches)) / math.log1p(_MAX_LENGTH))
+        for function in parsed.functions:
+            label = _FUNCTION_ALIASES.get(function.upper(), function.upper())
+            position = _FUNCTION_LABELS.index(label) if label in _FUNCTION_LABELS else len(_FUNCTION_LABELS)
+            blocks["functions"][position] += 1
+
+    if task.difficulty is not None:
+        blocks["difficulty"][_DIFFICULTIES.index(task.difficulty)] = 1
+    for tag in task.tags or []:
+        blocks["tags"][zlib.crc32(tag.encode("utf-8")) % TAG_BUCKETS] = 1
+
+    weighted = []
+    for name, _, weight in _BLOCKS:
+        block = blocks[name]
+        norm = float(np.linalg.norm(block))
+        weighted.append(block * (weight / norm) if norm > 0 else block)
+    vector = np.concatenate(weighted)
+    norm = float(np.linalg.norm(vector))
+    return (vector / norm).astype(np.float32) if norm > 0 else vector
+
+
+class TaskEmbeddingIndex:
+    """課題の特徴量ベクトルを連続した行列として保持する索引.
+
+    行の追加は容量を倍々に確保して償却O(1)、削除は末尾行との入れ替えで行い、
+    有効な行は常に行列の先頭に詰めて保持する.
+
+    Attributes:
+        asset_dir (Path | None): 譜例データのファイルパスを解決する基準ディレクトリ.
+
+    """
+
+    def __init__(self, asset_dir: Path | None = None) -> None:
+        """イニシャライザ.
+
+        Args:
+            asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+
+        """
+        self.asset_dir = asset_dir
+        self._matrix: Matrix = np.zeros((0, FEATURE_DIM), dtype=np.float32)
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[HarmonyTask], asset_dir: Path | None = None) -> "TaskEmbeddingIndex":
+        """課題一覧から索引を構築する.
+
+        Args:
+            tasks: 索引に登録する課題.
+            asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+
+        Returns:
+            TaskEmbeddingIndex: 構築済みの索引.
+
+        """
+        index = cls(asset_dir)
+        vectors: list[npt.NDArray[np.float32]] = []
+        for task in tasks:
+            if task.id in index._rows:
+                vectors[index._rows[task.id]] = extract_features(task, asset_dir)
+                continue
+            index._rows[task.id] = len(index._ids)
+            index._ids.append(task.id)
+            vectors.append(extract_features(task, asset_dir))
+        if vectors:
+            index._matrix = np.ascontiguousarray(np.stack(vectors), dtype=np.float32)
+        return index
+
+    @classmethod
+    def load(cls, path: Path, asset_dir: Path | None = None, *, mmap: bool = True) -> tuple["TaskEmbeddingIndex", str]:
+        """保存済みの索引を読み込む.
+
+        Args:
+            path: `save()` に渡した保存先のパス.
+            asset_dir: 譜例データのファイルパスを解決する基準ディレクトリ.
+            mmap: 行列をメモリマップで読み込むか. 差分更新時にはメモリへ複製される.
+
+        Returns:
+            tuple[TaskEmbeddingIndex, str]: 索引と、保存時に記録した課題一覧の版.
+
+        Raises:
+            OSError: ファイルの読み込みに失敗した場合.
+            ValueError: ファイルの内容が不正な場合.
+
+        """
+        meta = json.loads(_meta_path(path).read_text(encoding="utf-8"))
+        ids = meta["ids"]
+        matrix_path = _matrix_path(path, meta)
+        matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        if matrix.ndim != 2 or matrix.shape != (len(ids), FEATURE_DIM) or matrix.dtype != np.float32:  # noqa: PLR2004
+            msg = f"Embedding matrix does not match its metadata: {matrix_path}"
+            raise ValueError(msg)
+        index = cls(asset_dir)
+        index._matrix = matrix
+        index._ids = list(ids)
+        index._rows = {task_id: row for row, task_id in enumerate(ids)}
+        return index, str(meta["version"])
+
+    def save(self, path: Path, version: str) -> None:
+        """索引を `.npy` ファイルと、版とID一覧を記録したJSONファイルに保存する.
+
+        行列は保存ごとに一意な名前のファイルに書き込み、JSONファイルからその名前を参照する.
+        JSONファイルの置き換えを保存の確定とするため、複数のプロセスが同時に保存しても、
+        読み手が別の保存の行列とID一覧を組み合わせて読むことはない. 置き換えたJSONファイルが
+        参照していた行列ファイルは削除する. メモリマップ中の読み手は削除後も読み続けられる.
+
+        Args:
+            path: 保存先のパス(例: `tasks.embeddings.npy`). 行列は `tasks.embeddings.<ID>.npy`、
+                版とID一覧は `tasks.embeddings.json` に保存する.
+            version: 索引の元となった課題一覧の版.
+
+        Raises:
+            OSError: ファイルの保存に失敗した場合.
+
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        matrix_path = path.with_name(f"{path.stem}.{uuid.uuid4().hex}{path.suffix}")
+        meta_path = _meta_path(path)
+        tmp_meta_path = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        previous_matrix = None
+        with suppress(OSError, ValueError, KeyError, TypeError):
+            previous_matrix = _matrix_path(path, json.loads(meta_path.read_text(encoding="utf-8")))
+        meta = {"version": version, "ids": self._ids, "matrix": matrix_path.name}
+        try:
+            with matrix_path.open("wb") as f:
+                np.save(f, np.ascontiguousarray(self.matrix))
+            tmp_meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            tmp_meta_path.replace(meta_path)
+        except OSError:
+            matrix_path.unlink(missing_ok=True)
+            tmp_meta_path.unlink(missing_ok=True)
+            raise
+        if previous_matrix is not None:
+            previous_matrix.unlink(missing_ok=True)
+
+    @property
+    def matrix(self) -> Matrix:
+        """有効な行のみを含む特徴量行列(行は登録順ではなく内部の行番号順)."""
+        return self._matrix[: len(self._ids)]
+
+    def __len__(self) -> int:
+        """索引に登録されている課題数."""
+        return len(self._ids)
+
+    def __contains__(self, task_id: object) -> bool:
+        """指定IDの課題が索引に登録されているか."""
+        return task_id in self._rows
+
+    def task_saved(self, task: HarmonyTask) -> None:
+        """保存された課題の特徴量を追加または更新する.
+
+        Args:
+            task: 保存された課題.
+
+        """
+        self.upsert(task.id, extract_features(task, self.asset_dir))
+
+    def task_deleted(self, task_id: str) -> None:
+        """削除された課題を索引から除く.
+
+        Args:
+            task_id: 削除された課題のID.
+
+        """
+        self.remove(task_id)
+
+    def upsert(self, task_id: str, vector: npt.NDArray[np.float32]) -> None:
+        """課題の特徴量ベクトルを追加または更新する.
+
+        Args:
+            task_id: 課題ID.
+            vector: 長さ `FEATURE_DIM` の正規化済みベクトル.
+
+        """
+        self._ensure_writable(len(self._ids) + (task_id not in self._rows))
+        row = self._rows.get(task_id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[task_id] = row
+            self._ids.append(task_id)
+        self._matrix[row] = vector
+
+    def remove(self, task_id: str) -> None:
+        """課題を索引から除く. 末尾の行を空いた行へ移動して行列を詰める.
+
+        Args:
+            task_id: 課題ID. 未登録の場合は何もしない.
+
+        """
+        row = self._rows.pop(task_id, None)
+        if row is None:
+            return
+        self._ensure_writable(len(self._ids))
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+
+    def similar(self, task_id: str, k: int) -> list[SimilarTask]:
+        """指定課題とコサイン類似度の高い課題を上位k件返す.
+
+        Args:
+            task_id: 基準とする課題のID.
+            k: 返す件数の上限.
+
+        Returns:
+            list[SimilarTask]: 類似度の降順に並んだ類似課題(基準課題自身は含まない).
+
+        Raises:
+            KeyError: 基準課題が索引に登録されていない場合.
+
+        """
+        row = self._rows[task_id]
+        matrix = self.matrix
+        scores = matrix @ matrix[row]
+        scores[row] = -np.inf
+        k = min(k, len(self._ids) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [SimilarTask(task_id=self._ids[i], score=float(scores[i])) for i in top]
+
+    def _ensure_writable(self, rows: int) -> None:
+        """指定行数を書き込める容量を確保する. メモリマップ中の行列はメモリへ複製する."""
+        capacity = self._matrix.shape[0]
+        if isinstance(self._matrix, np.memmap) or not self._matrix.flags.writeable or capacity < rows:
+            new_capacity = max(rows, capacity * 2 if capacity < rows else capacity, 8)
+            matrix = np.zeros((new_capacity, FEATURE_DIM), dtype=np.float32)
+            matrix[: len(self._ids)] = self._matrix[: len(self._ids)]
+            self._matrix = matrix
+
+
+def load_or_build_index(repository: HarmonyTaskRepository) -> TaskEmbeddingIndex:
+    """リポジトリの特徴量索引を取得する.
+
+    保存済みの索引が課題一覧の現在の版と一致すればメモリマップで読み込み、
+    そうでなければ課題一覧から構築して保存する.
+
+    Args:
+        repository: 索引の元となるリポジトリ.
+
+    Returns:
+        TaskEmbeddingIndex: 特徴量索引.
+
+    """
+    version = repository.catalog_version()
+    path = repository.derived_data_path("embeddings.npy")
+    if path is not None and version is not None and path.exists():
+        try:
+            index, saved_version = TaskEmbeddingIndex.load(path, repository.asset_dir())
+        except (OSError, ValueError, KeyError):
+            pass
+        else:
+            if saved_version == version:
+                return index
+
+    index = TaskEmbeddingIndex.from_tasks(repository.load_tasks(), repository.asset_dir())
+    save_index(repository, index, version)
+    return index
+
+
+def save_index(repository: HarmonyTaskRepository, index: TaskEmbeddingIndex, version: str | None) -> None:
+    """特徴量索引を課題一覧の版とともにリポジトリの派生データとして保存する.
+
+    差分更新した索引も保存することで、他のプロセスや再起動後のプロセスは
+    課題一覧から構築し直さずにメモリマップで読み込める.
+
+    Args:
+        repository: 索引の元となるリポジトリ.
+        index: 保存する索引.
+        version: 索引が反映している課題一覧の版. 保存時点の版は別のプロセスの書き込みで
+            進んでいる場合があるため、索引を構築・更新した時点の版を渡す.
+
+    """
+    path = repository.derived_data_path("embeddings.npy")
+    if path is None or version is None:
+        return
+    # 保存に失敗しても索引自体は利用できるため、次回の再構築に任せる
+    with suppress(OSError):
+        index.save(path, version)
+
+
+def _meta_path(path: Path) -> Path:
+    """`.npy` ファイルに対応するメタデータファイルのパス."""
+    return path.with_suffix(".json")
+
+
+def _matrix_path(path: Path, meta: dict) -> Path:
+    """メタデータが参照する行列ファイルのパス. 保存先と同じディレクトリに限る."""
+    return path.with_name(Path(meta["matrix"]).name)
@@ -0,0 +1,52 @@
+"""テスト全体で共有するフィクスチャ."""
+
+import json
+from collections.abc import Callable, Mapping, Sequence
+
+import pytest
+
+from models.harmony_task_model import HarmonyTask
+
+
+def build_task(  # noqa: PLR0913
+    task_id: str,
+    notes: Sequence[object] = ("E5", "D5", "C5"),
+    *,
+    difficulty: str | None = None,
+    tags: list[str] | None = None,
+    score: Mapping[str, object] | None = None,
+    answer: list[dict] | None = None,
+    **fields: object,
+) -> HarmonyTask:
+    """JSON形式の譜例を持つテスト用の和声課題を作成する.
+
+    Args:
+        task_id: 課題ID.
+        notes: 譜例の音列(音名、MIDI音番号、音価付きの辞書、休符のNone).
+        difficulty: 難易度.
+        tags: タグ.
+        score: 譜例に加える項目(調号 `key`、旋法 `mode`、和音機能 `functions` など).
+        answer: 解答. 省略した場合は空のJSON形式の解答を1件持つ.
+        **fields: 課題に加える項目(`title` など).
+
+    Returns:
+        HarmonyTask: 和声課題.
+
+    """
+    return HarmonyTask.model_validate(
+        {
+            "id": task_id,
+            "description": "テスト課題",
+            "score": {"type": "json", "data": json.dumps({**(score or {}), "notes": list(notes)})},
+            "answer": answer if answer is not None else [{"type": "json", "data": "{}"}],
+            "difficulty": difficulty,
+            "tags": tags,
+            **fields,
+        },
+    )
+
+
+@pytest.fixture
+def make_task() -> Callable[..., HarmonyTask]:
+    """テスト用の和声課題を作成する関数(`build_task()`)を提供する."""
+    return build_task
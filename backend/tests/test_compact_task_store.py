@@ -0,0 +1,73 @@
+"""CompactTaskStoreのテスト."""
+
+from collections.abc import Callable
+
+import pytest
+
+from models.harmony_task_model import HarmonyTask
+from repositories.compact_task_store import CompactTaskStore
+
+ANSWERS = [{"type": "musicxml", "data": "answers/a.musicxml"}, {"type": "image", "data": "b.png"}]
+
+
+def get_task(store: CompactTaskStore, task_id: str) -> HarmonyTask:
+    task = store.get(task_id)
+    assert task is not None
+    return task
+
+
+@pytest.fixture
+def tasks(make_task: Callable[..., HarmonyTask]) -> list[HarmonyTask]:
+    return [
+        make_task("1", difficulty="easy", tags=["バス課題", "機能和声"], answer=ANSWERS, title="課題1"),
+        make_task("2", ["C3", "G3"], difficulty="hard", tags=["ソプラノ課題", "半音階"], answer=ANSWERS),
+        make_task("3", answer=ANSWERS),
+        make_task("4", difficulty="easy", tags=["バス課題"], answer=ANSWERS),
+    ]
+
+
+def test_round_trip(tasks: list[HarmonyTask]):
+    store = CompactTaskStore(tasks)
+
+    assert len(store) == 4
+    assert "2" in store
+    assert "5" not in store
+    assert [task.model_dump() for task in store] == [task.model_dump() for task in tasks]
+    assert get_task(store, "3").model_dump() == tasks[2].model_dump()
+    assert store.get("5") is None
+
+
+def test_filter(tasks: list[HarmonyTask]):
+    store = CompactTaskStore(tasks)
+
+    def ids(difficulty: str | None = None, tags: list[str] | None = None) -> list[str]:
+        return [task.id for task in store.filter(difficulty, tags)]
+
+    assert ids() == ["1", "2", "3", "4"]
+    assert ids(difficulty="easy") == ["1", "4"]
+    assert ids(tags=["バス課題"]) == ["1", "4"]
+    assert ids(difficulty="easy", tags=["バス課題", "機能和声"]) == ["1"]
+    assert ids(tags=["存在しないタグ"]) == []
+    assert ids(difficulty="unknown") == []
+
+
+def test_shares_tags_and_payload_buffer(tasks: list[HarmonyTask]):
+    store = CompactTaskStore(tasks)
+
+    first, fourth = get_task(store, "1"), get_task(store, "4")
+    assert first.tags is not None
+    assert fourth.tags is not None
+    assert first.tags[0] is fourth.tags[0]
+    assert store.payload_bytes == sum(
+        len(text.encode("utf-8"))
+        for task in tasks
+        for text in (task.description, task.score.data, *(answer.data for answer in task.answer))
+    )
+
+
+def test_later_duplicate_replaces_earlier(tasks: list[HarmonyTask], make_task: Callable[..., HarmonyTask]):
+    store = CompactTaskStore([*tasks, make_task("1", difficulty="normal", tags=[])])
+
+    assert len(store) == 4
+    assert [task.id for task in store] == ["2", "3", "4", "1"]
+    assert get_task(store, "1").difficulty == "normal"
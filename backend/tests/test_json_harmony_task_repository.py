@@ -1,12 +1,15 @@
 """JsonHarmonyTaskRepositoryのテスト."""
 
+import json
 import tempfile
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 
-from repositories.harmony_task_repository import PersistenceError
+from models.harmony_task_model import Answer, AnswerType, HarmonyTask, Score, ScoreType
+from repositories.harmony_task_repository import PersistenceError, ValidationError
 from repositories.json_harmony_task_repository import JsonHarmonyTaskRepository
 
 
@@ -21,6 +24,7 @@ def temp_json_path() -> Generator[str, None, None]:
     with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
         yield tmp.name
     Path(tmp.name).unlink()
+    Path(tmp.name).with_suffix(".lock").unlink(missing_ok=True)
 
 
 def test_invalid_json(temp_json_path: str) -> None:
@@ -40,3 +44,118 @@ def test_invalid_json(temp_json_path: str) -> None:
     # list_tasks()呼び出し時にPersistenceErrorが発生することを確認
     with pytest.raises(PersistenceError):
         repo.list_tasks()
+
+
+def test_load_tasks_by_ids(temp_json_path: str) -> None:
+    """複数IDの一括取得テスト.
+
+    Args:
+        temp_json_path: テスト用の一時ファイルパス.
+
+    """
+    repo = JsonHarmonyTaskRepository(temp_json_path)
+    for task_id in ("1", "2", "3"):
+        repo.save_task(
+            HarmonyTask(
+                id=task_id,
+                description=f"課題{task_id}",
+                score=Score(type=ScoreType.json, data="{}"),
+                answer=[Answer(type=AnswerType.json, data="{}")],
+            ),
+        )
+
+    tasks = repo.load_tasks_by_ids(["3", "999", "1"])
+    assert list(tasks) == ["1", "3"]
+    task = tasks["3"]
+    assert isinstance(task, HarmonyTask)
+    assert task.description == "課題3"
+
+
+def test_load_tasks_by_ids_invalid_record(temp_json_path: str) -> None:
+    """不正なデータを含む複数IDの一括取得テスト.
+
+    Args:
+        temp_json_path: テスト用の一時ファイルパス.
+
+    """
+    repo = JsonHarmonyTaskRepository(temp_json_path)
+    repo.save_task(
+        HarmonyTask(
+            id="1",
+            description="課題1",
+            score=Score(type=ScoreType.json, data="{}"),
+            answer=[Answer(type=AnswerType.json, data="{}")],
+        ),
+    )
+    # 検証を通らない課題をファイルへ直接書き込む
+    path = Path(temp_json_path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["tasks"].append({"id": "2", "description": "課題2", "difficulty": "impossible"})
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    # 不正な課題だけがエラーになり、他の課題は取得できることを確認
+    tasks = repo.load_tasks_by_ids(["1", "2"])
+    assert isinstance(tasks["1"], HarmonyTask)
+    assert isinstance(tasks["2"], ValidationError)
+
+
+def test_iter_tasks_reads_incrementally(temp_json_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """課題の逐次読み込みテスト.
+
+    Args:
+        temp_json_path: テスト用の一時ファイルパス.
+        monkeypatch: チャンクサイズを小さくして要素の途中で区切られるようにする.
+
+    """
+    monkeypatch.setattr("repositories.json_harmony_task_repository._READ_CHUNK_SIZE", 7)
+    tasks = [
+        {
+            "id": str(i),
+            "description": f"課題{i}",
+            "score": {"type": "json", "data": "{}"},
+            "answer": [{"type": "json", "data": "{}"}],
+            "difficulty": "easy" if i % 2 else "hard",
+            "tags": ["バス課題"],
+        }
+        for i in range(5)
+    ]
+    # 不正な課題は読み飛ばす. metadataが先にあっても読み込める
+    data = {"metadata": {"version": "1.0", "totalTasks": 123456}, "tasks": [*tasks, {"id": "broken"}]}
+    Path(temp_json_path).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    repo = JsonHarmonyTaskRepository(temp_json_path)
+
+    assert [task.id for task in repo.iter_tasks()] == ["0", "1", "2", "3", "4"]
+    assert [task.id for task in repo.iter_tasks(difficulty="easy", tags=["バス課題"])] == ["1", "3"]
+
+    Path(temp_json_path).write_text('{"tasks": [{"id": "1"', encoding="utf-8")
+    with pytest.raises(PersistenceError):
+        list(repo.iter_tasks())
+
+
+def test_change_sequence_is_unique_across_concurrent_writers(temp_json_path: str) -> None:
+    """複数のリポジトリインスタンスが同時に書き込んでも通し番号が重複しないテスト.
+
+    Args:
+        temp_json_path: テスト用の一時ファイルパス.
+
+    """
+    JsonHarmonyTaskRepository(temp_json_path)
+
+    def write(worker: int) -> None:
+        repo = JsonHarmonyTaskRepository(temp_json_path)
+        for i in range(10):
+            repo.save_task(
+                HarmonyTask(
+                    id=f"{worker}-{i}",
+                    description="課題",
+                    score=Score(type=ScoreType.json, data="{}"),
+                    answer=[Answer(type=AnswerType.json, data="{}")],
+                ),
+            )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write, range(4)))
+
+    repo = JsonHarmonyTaskRepository(temp_json_path)
+    assert [change.sequence for change in repo.changes_since(0)] == list(range(1, 41))
+    assert len(repo.load_tasks()) == 40
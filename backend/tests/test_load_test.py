@@ -0,0 +1,52 @@
+"""負荷試験ハーネスのテスト."""
+
+import asyncio
+import csv
+import json
+import math
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load_test import percentile, run_level, summarize, write_results, write_tasks_file
+from main import create_app
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([3.0], 95) == 3
+    assert math.isnan(percentile([], 50))
+
+
+def test_summarize():
+    result = summarize([0.001] * 9 + [0.1], 2, 2.0, mode="json", workers=1, tasks=10, endpoint="list", concurrency=4)
+    assert result.requests == 12
+    assert result.error_rate == 2 / 12
+    assert result.throughput == 6
+    assert result.p50_ms == 1
+    assert result.p99_ms == 100
+
+
+def test_run_level_against_app(tmp_path: Path):
+    tasks_file = write_tasks_file(tmp_path, 20)
+    app = create_app(tasks_file)
+
+    async def run() -> tuple[list[float], int, float]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_level(client, ["/api/tasks/task-000003", "/api/tasks/missing"], 4, 0.2)
+
+    latencies, errors, elapsed = asyncio.run(run())
+    assert latencies
+    assert errors > 0
+    assert elapsed >= 0.2
+
+    output = tmp_path / "results" / "load_test"
+    result = summarize(latencies, errors, elapsed, mode="json", workers=1, tasks=20, endpoint="detail", concurrency=4)
+    write_results([result], output)
+    assert json.loads(output.with_suffix(".json").read_text(encoding="utf-8"))[0]["requests"] == result.requests
+    with output.with_suffix(".csv").open(encoding="utf-8") as f:
+        assert next(csv.DictReader(f))["endpoint"] == "detail"
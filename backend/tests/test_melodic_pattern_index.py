@@ -0,0 +1,117 @@
+"""旋律パターン索引のテスト."""
+
+from collections.abc import Callable
+
+import pytest
+
+from models.harmony_task_model import HarmonyTask
+from services.melodic_pattern_index import (
+    MelodicMatch,
+    MelodicPatternIndex,
+    parse_scale_degree,
+    to_intervals,
+    tonic_pitch_class,
+)
+
+
+@pytest.fixture
+def index(make_task: Callable[..., HarmonyTask]) -> MelodicPatternIndex:
+    tasks = [
+        # 下行半音階的テトラコルド(D-C#-C-B-Bb-A)
+        make_task("1", ["D3", "C#3", "C3", "B2", "Bb2", "A2"]),
+        make_task("2", ["C3", "G3", "F3", "E3", "Eb3", "D3", "G2", "C3"]),
+        make_task("3", ["C3", "D3", "E3", "F3"]),
+        HarmonyTask.model_validate(
+            {
+                "id": "4",
+                "description": "画像課題",
+                "score": {"type": "image", "data": "img.png"},
+                "answer": [{"type": "image", "data": "img.png"}],
+            },
+        ),
+    ]
+    return MelodicPatternIndex.from_tasks(tasks, max_gram=3)
+
+
+def test_to_intervals():
+    assert to_intervals([60, 59, 62]) == (-1, 3)
+
+
+def test_search_is_transposition_invariant(index: MelodicPatternIndex):
+    assert index.search([-1, -1, -1]) == [
+        MelodicMatch(task_id="1", position=0),
+        MelodicMatch(task_id="1", position=1),
+        MelodicMatch(task_id="1", position=2),
+        MelodicMatch(task_id="2", position=2),
+    ]
+
+
+def test_search_longer_than_max_gram(index: MelodicPatternIndex):
+    assert index.search([-1, -1, -1, -1, -1]) == [MelodicMatch(task_id="1", position=0)]
+    assert index.search([-2, -1, -1, -1]) == [MelodicMatch(task_id="2", position=1)]
+    assert index.search([2, 2, 1, 1]) == []
+
+
+def test_unparseable_scores_are_skipped(index: MelodicPatternIndex):
+    assert len(index) == 3
+    assert "4" not in index
+
+
+def test_add_and_remove(index: MelodicPatternIndex):
+    index.remove("1")
+    assert [match.task_id for match in index.search([-1, -1, -1])] == ["2"]
+    index.add("1", [62, 61])
+    assert index.search([-1, -1, -1]) == [MelodicMatch(task_id="2", position=2)]
+    assert MelodicMatch(task_id="1", position=0) in index.search([-1])
+
+
+def test_empty_pattern(index: MelodicPatternIndex):
+    with pytest.raises(ValueError, match="at least one interval"):
+        index.search([])
+
+
+def test_malformed_scores_are_skipped(make_task: Callable[..., HarmonyTask]):
+    tasks = [make_task("1", ["C3", "D3"]), make_task("2", [{"pitch": "C3", "duration": "long"}])]
+    index = MelodicPatternIndex.from_tasks(tasks)
+    assert len(index) == 1
+    assert "2" not in index
+
+
+def test_parse_scale_degree():
+    assert parse_scale_degree("1") == 0
+    assert parse_scale_degree("5") == 7
+    assert parse_scale_degree("b3") == 3
+    assert parse_scale_degree("#4") == 6
+    assert parse_scale_degree("#7") == 0
+    for value in ("0", "8", "3b", "x"):
+        with pytest.raises(ValueError, match="Invalid scale degree"):
+            parse_scale_degree(value)
+
+
+def test_tonic_pitch_class():
+    assert tonic_pitch_class(0) == 0
+    assert tonic_pitch_class(-1, "minor") == 2
+    assert tonic_pitch_class(3, "major") == 9
+    assert tonic_pitch_class(-3, "minor") == 0
+
+
+def test_search_scale_degrees(make_task: Callable[..., HarmonyTask]):
+    tasks = [
+        # ハ長調とト長調の 5-4-3-2-1、ニ短調の 5-4-b3-2-1
+        make_task("1", ["G3", "F3", "E3", "D3", "C3"], score={"key": 0}),
+        make_task("2", ["D4", "C4", "B3", "A3", "G3"], score={"key": 1, "mode": "major"}),
+        make_task("3", ["A3", "G3", "F3", "E3", "D3"], score={"key": -1, "mode": "minor"}),
+        # 調号が無い課題は音度では検索できない
+        make_task("4", ["G3", "F3", "E3", "D3", "C3"]),
+    ]
+    index = MelodicPatternIndex.from_tasks(tasks, max_gram=3)
+    major = [parse_scale_degree(value) for value in ("5", "4", "3", "2", "1")]
+    minor = [parse_scale_degree(value) for value in ("5", "4", "b3", "2", "1")]
+
+    assert [match.task_id for match in index.search_scale_degrees(major)] == ["1", "2"]
+    assert index.search_scale_degrees(minor) == [MelodicMatch(task_id="3", position=0)]
+    assert [match.task_id for match in index.search_scale_degrees([2, 0])] == ["1", "2", "3"]
+    index.remove("1")
+    assert [match.task_id for match in index.search_scale_degrees(major)] == ["2"]
+    with pytest.raises(ValueError, match="at least one scale degree"):
+        index.search_scale_degrees([])
@@ -0,0 +1,65 @@
+"""MIDI変換モジュールのテスト."""
+
+import struct
+
+import pytest
+
+from services.midi_renderer import TICKS_PER_QUARTER, content_hash, render_midi
+from services.score_parser import Note, ParsedScore, Part
+
+
+def read_chunks(data: bytes) -> list[tuple[bytes, bytes]]:
+    chunks = []
+    offset = 0
+    while offset < len(data):
+        kind = data[offset : offset + 4]
+        (length,) = struct.unpack(">I", data[offset + 4 : offset + 8])
+        chunks.append((kind, data[offset + 8 : offset + 8 + length]))
+        offset += 8 + length
+    return chunks
+
+
+def test_render_midi_structure():
+    score = ParsedScore(
+        parts=(
+            Part(notes=(Note(72, 1.0), Note(None, 1.0), Note(71, 2.0))),
+            Part(notes=(Note(48, 4.0),)),
+        ),
+        key_fifths=0,
+        mode="major",
+    )
+    chunks = read_chunks(render_midi(score, tempo=120))
+    assert [kind for kind, _ in chunks] == [b"MThd", b"MTrk", b"MTrk", b"MTrk"]
+    assert struct.unpack(">HHH", chunks[0][1]) == (1, 3, TICKS_PER_QUARTER)
+    # テンポ: 120BPM = 500000マイクロ秒/拍
+    assert b"\x00\xff\x51\x03\x07\xa1\x20" in chunks[1][1]
+    # 休符の分(480 tick = 0x83 0x60)だけ遅れて2音目が鳴る
+    assert chunks[2][1] == (
+        b"\x00\x90\x48\x50"  # 1音目の発音
+        b"\x83\x60\x80\x48\x00"  # 四分音符後に消音
+        b"\x83\x60\x90\x47\x50"  # 四分休符後に2音目
+        b"\x87\x40\x80\x47\x00"  # 二分音符後に消音
+        b"\x00\xff\x2f\x00"  # トラック終端
+    )
+
+
+def test_render_midi_invalid_tempo():
+    with pytest.raises(ValueError, match="tempo"):
+        render_midi(ParsedScore(parts=()), tempo=0)
+
+
+def test_render_midi_clamps_invalid_durations():
+    score = ParsedScore(parts=(Part(notes=(Note(60, -1.0), Note(None, 1e12), Note(62, 1.0))),), key_fifths=100)
+    chunks = read_chunks(render_midi(score))
+    # 負の音価は長さ0、表せない長さは可変長数値の最大値に丸める. 範囲外の調号は出力しない
+    assert chunks[2][1] == (
+        b"\x00\x90\x3c\x50\x00\x80\x3c\x00\xff\xff\xff\x7f\x90\x3e\x50\x83\x60\x80\x3e\x00\x00\xff\x2f\x00"
+    )
+    assert b"\xff\x59" not in chunks[1][1]
+
+
+def test_content_hash_depends_on_inputs():
+    base = content_hash("json", "{}", 90)
+    assert base == content_hash("json", "{}", 90)
+    assert base != content_hash("json", "{}", 100)
+    assert base != content_hash("musicxml", "{}", 90)
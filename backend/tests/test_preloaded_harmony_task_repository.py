@@ -0,0 +1,177 @@
+"""PreloadedHarmonyTaskRepositoryとアプリケーションファクトリのテスト."""
+
+import asyncio
+import gc
+import json
+import os
+import threading
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import create_app
+from models.harmony_task_model import HarmonyTask
+from repositories.harmony_task_repository import HarmonyTaskRepository, PersistenceError, TaskNotFoundError
+from repositories.json_harmony_task_repository import JsonHarmonyTaskRepository
+from repositories.preloaded_harmony_task_repository import PreloadedHarmonyTaskRepository
+from services.melodic_pattern_index import MelodicPatternIndex
+
+
+@pytest.fixture
+def tasks_file(tmp_path: Path, make_task: Callable[..., HarmonyTask]) -> Path:
+    path = tmp_path / "tasks.json"
+    source = JsonHarmonyTaskRepository(str(path))
+    source.save_task(make_task("1", difficulty="easy", tags=["ソプラノ課題"]))
+    source.save_task(make_task("2", difficulty="hard", tags=["ソプラノ課題", "半音階"]))
+    return path
+
+
+@pytest.fixture
+def unfreeze_gc() -> Iterator[None]:
+    """`create_app(preload=True)` が凍結したオブジェクトを、テストの成否に関わらず戻す."""
+    yield
+    gc.unfreeze()
+
+
+def test_reads_are_served_from_snapshot(tasks_file: Path):
+    repository = PreloadedHarmonyTaskRepository(JsonHarmonyTaskRepository(str(tasks_file)))
+    tasks_file.write_text(json.dumps({"tasks": []}), encoding="utf-8")
+
+    assert [task.id for task in repository.load_tasks()] == ["1", "2"]
+    assert repository.load_task("2").difficulty == "hard"
+    assert [task.id for task in repository.list_tasks(tags=["半音階"])] == ["2"]
+    assert [task.id for task in repository.list_tasks(difficulty="easy")] == ["1"]
+
+    repository.reload()
+    assert repository.load_tasks() == []
+    with pytest.raises(TaskNotFoundError):
+        repository.load_task("1")
+
+
+def test_writes_update_source_and_snapshot(tasks_file: Path, make_task: Callable[..., HarmonyTask]):
+    source = JsonHarmonyTaskRepository(str(tasks_file))
+    repository = PreloadedHarmonyTaskRepository(source)
+    events: list[tuple[str, str]] = []
+    versions: list[str | None] = []
+
+    class Recorder:
+        def task_saved(self, task: HarmonyTask, previous_version: str | None, version: str | None) -> None:  # noqa: ARG002
+            events.append(("saved", task.id))
+            versions.append(version)
+
+        def task_deleted(self, task_id: str, previous_version: str | None, version: str | None) -> None:  # noqa: ARG002
+            events.append(("deleted", task_id))
+            versions.append(version)
+
+    repository.add_listener(Recorder())
+    repository.save_task(make_task("3", difficulty="normal", tags=[]))
+    repository.delete_task("1")
+
+    assert [task.id for task in repository.load_tasks()] == ["2", "3"]
+    assert [task.id for task in source.load_tasks()] == ["2", "3"]
+    assert repository.catalog_version() == source.catalog_version()
+    assert events == [("saved", "3"), ("deleted", "1")]
+    assert versions[-1] == source.catalog_version()
+
+
+@pytest.mark.usefixtures("unfreeze_gc")
+def test_preloaded_app_serves_shared_snapshot(tasks_file: Path):
+    app = create_app(tasks_file, preload=True)
+    assert gc.get_freeze_count() > 0
+
+    with TestClient(app) as client:
+        response = client.get("/api/tasks")
+        assert response.status_code == 200
+        assert [task["id"] for task in response.json()] == ["1", "2"]
+        assert client.get("/api/tasks/1/similar").status_code == 200
+
+
+@pytest.mark.usefixtures("unfreeze_gc")
+def test_preloaded_app_picks_up_changes_by_another_worker(tasks_file: Path, make_task: Callable[..., HarmonyTask]):
+    app = create_app(tasks_file, preload=True)
+
+    with TestClient(app) as client:
+        assert client.get("/api/tasks/1").json()["difficulty"] == "easy"
+        JsonHarmonyTaskRepository(str(tasks_file)).save_task(make_task("1", difficulty="hard", tags=["ソプラノ課題"]))
+        assert client.get("/api/tasks/1").json()["difficulty"] == "hard"
+        assert [match["task_id"] for match in client.get("/api/tasks/1/similar").json()] == ["2"]
+
+
+@pytest.mark.usefixtures("unfreeze_gc")
+def test_app_starts_with_malformed_score(tasks_file: Path, make_task: Callable[..., HarmonyTask]):
+    JsonHarmonyTaskRepository(str(tasks_file)).save_task(make_task("3", [{"pitch": "C3", "duration": "long"}]))
+
+    for preload in (False, True):
+        with TestClient(create_app(tasks_file, preload=preload)) as client:
+            assert client.get("/api/tasks/search/melodic", params={"intervals": "-2"}).status_code == 200
+            assert client.get("/api/tasks/1/similar").status_code == 200
+            assert client.get("/api/tasks/3/score.mid").status_code == 422
+
+
+def test_app_starts_when_warm_up_fails(tasks_file: Path, monkeypatch: pytest.MonkeyPatch):
+    def fail(repository: HarmonyTaskRepository) -> None:  # noqa: ARG001
+        msg = "disk error"
+        raise PersistenceError(msg)
+
+    monkeypatch.setattr(main.tasks.similarity_index_cache, "get", fail)
+    with TestClient(create_app(tasks_file)) as client:
+        assert client.get("/api/tasks/1").status_code == 200
+
+
+@pytest.mark.skipif(main.RELOAD_SIGNAL is None, reason="reload signal is not available")
+def test_reload_signal_reloads_snapshot_and_indexes(
+    tasks_file: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    make_task: Callable[..., HarmonyTask],
+):
+    repository = PreloadedHarmonyTaskRepository(JsonHarmonyTaskRepository(str(tasks_file)))
+    main.tasks.attach_index_caches(repository)
+    main.warm_up(repository)
+    # 別のワーカーによる変更. このワーカーには通知されない
+    JsonHarmonyTaskRepository(str(tasks_file)).save_task(make_task("3", difficulty="normal", tags=["ソプラノ課題"]))
+    assert "3" not in main.tasks.melodic_index_cache.get(repository)
+
+    reload_signal = main.RELOAD_SIGNAL
+    assert reload_signal is not None
+    reloaded = threading.Event()
+    warm_up = main.warm_up
+
+    def record_warm_up(repository: HarmonyTaskRepository) -> None:
+        warm_up(repository)
+        reloaded.set()
+
+    monkeypatch.setattr(main, "warm_up", record_warm_up)
+    built: list[HarmonyTaskRepository] = []
+    build = main.tasks.melodic_index_cache._build  # noqa: SLF001
+
+    async def send_signal() -> None:
+        main._install_reload_signal(repository)  # noqa: SLF001
+        try:
+            os.kill(os.getpid(), reload_signal)
+            await asyncio.get_running_loop().run_in_executor(None, reloaded.wait, 10)
+        finally:
+            asyncio.get_running_loop().remove_signal_handler(reload_signal)
+
+    asyncio.run(send_signal())
+
+    assert reloaded.is_set()
+    assert repository.load_task("3").difficulty == "normal"
+
+    # 索引は読み込み直しの時点で構築済みのため、取得時に構築し直さない
+    def record_build(repo: HarmonyTaskRepository) -> MelodicPatternIndex:
+        built.append(repo)
+        return build(repo)
+
+    monkeypatch.setattr(main.tasks.melodic_index_cache, "_build", record_build)
+    assert "3" in main.tasks.melodic_index_cache.get(repository)
+    assert "3" in main.tasks.similarity_index_cache.get(repository)
+    assert built == []
+
+
+def test_load_tasks_by_ids(tasks_file: Path):
+    repository = PreloadedHarmonyTaskRepository(JsonHarmonyTaskRepository(str(tasks_file)))
+
+    assert list(repository.load_tasks_by_ids(["2", "999", "2"])) == ["2"]
@@ -0,0 +1,91 @@
+"""実施生成ソルバーのテスト."""
+
+import json
+
+import pytest
+
+from models.harmony_task_model import AnswerType, HarmonyTask
+from services.realization_solver import (
+    VOICE_RANGES,
+    RealizationError,
+    RealizationSolver,
+    diatonic_chords,
+    realize_task,
+)
+from services.score_parser import GivenVoice, parse_pitch, parse_score
+
+BASS_LINE = [parse_pitch(note) for note in ["C3", "F3", "G3", "A2", "D3", "G2", "C3"]]
+
+
+def has_parallel_perfect(upper: list[int], lower: list[int]) -> bool:
+    for i in range(1, len(upper)):
+        before = (upper[i - 1] - lower[i - 1]) % 12
+        after = (upper[i] - lower[i]) % 12
+        moved = upper[i - 1] != upper[i] and lower[i - 1] != lower[i]
+        if moved and before == after and after in (0, 7):
+            return True
+    return False
+
+
+def test_diatonic_chords_in_minor():
+    chords = {chord.name: chord for chord in diatonic_chords(0, "minor")}
+    # イ短調のVは導音(G#)を含む
+    assert chords["V"].pitch_classes == (4, 8, 11)
+    assert chords["i"].leading_tone == 8
+
+
+def test_solve_bass_task():
+    realizations = RealizationSolver().solve(BASS_LINE, GivenVoice.bass, n_results=3)
+    assert len(realizations) == 3
+    assert [r.cost for r in realizations] == sorted(r.cost for r in realizations)
+
+    best = realizations[0]
+    assert best.bass == BASS_LINE
+    assert best.chords[0] == "I"
+    assert best.chords[-1] == "I"
+    voices = [best.soprano, best.alto, best.tenor, best.bass]
+    for voice, (low, high) in zip(voices, VOICE_RANGES, strict=True):
+        assert all(low <= pitch <= high for pitch in voice)
+    for upper in range(4):
+        for lower in range(upper + 1, 4):
+            assert not has_parallel_perfect(voices[upper], voices[lower])
+
+
+def test_solve_soprano_task():
+    soprano = [parse_pitch(note) for note in ["E5", "D5", "C5", "B4", "C5"]]
+    best = RealizationSolver().solve(soprano, GivenVoice.soprano, n_results=1)[0]
+    assert best.soprano == soprano
+    assert best.functions[-2:] == ["D", "T"]
+
+
+def test_solve_respects_time_budget():
+    # 時間上限を超えても、ビーム幅を縮めて解を返す
+    realizations = RealizationSolver().solve(BASS_LINE * 4, GivenVoice.bass, n_results=2, time_budget=0)
+    assert len(realizations) == 2
+
+
+def test_chromatic_pitch_cannot_be_realized():
+    with pytest.raises(RealizationError):
+        RealizationSolver().solve([parse_pitch("C#3")], GivenVoice.bass)
+
+
+def test_realize_task_produces_answer():
+    task = HarmonyTask.model_validate(
+        {
+            "id": "1",
+            "description": "バス課題",
+            "score": {"type": "json", "data": json.dumps({"notes": ["C3", "F3", "G3", "C3"]})},
+            "answer": [{"type": "json", "data": "{}"}],
+            "tags": ["バス課題"],
+        },
+    )
+    realization = realize_task(task, n_results=1)[0]
+    answer = realization.to_answer()
+    assert answer.type == AnswerType.json
+    parsed = parse_score(answer)
+    assert [part.pitches for part in parsed.parts] == [
+        tuple(realization.soprano),
+        tuple(realization.alto),
+        tuple(realization.tenor),
+        tuple(realization.bass),
+    ]
@@ -0,0 +1,42 @@
+"""レンダリング結果キャッシュのテスト."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from services.render_cache import RenderCache
+
+
+def test_get_or_render_renders_once(tmp_path: Path):
+    cache = RenderCache(tmp_path, suffix=".mid")
+    calls = []
+
+    def render() -> bytes:
+        calls.append(1)
+        return b"MThd"
+
+    assert cache.get_or_render("ab" * 16, render) == b"MThd"
+    assert cache.get_or_render("ab" * 16, render) == b"MThd"
+    assert len(calls) == 1
+    assert (tmp_path / f"{'ab' * 16}.mid").exists()
+
+
+def test_evicts_least_recently_used(tmp_path: Path):
+    cache = RenderCache(tmp_path, max_bytes=25)
+    keys = ["0" * 32, "1" * 32, "2" * 32]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, b"x" * 10)
+        os.utime(tmp_path / f"{key}.bin", ns=(i * 10**9, i * 10**9))
+    # 1件目を参照して最近利用したものにする
+    assert cache.get(keys[0]) is not None
+
+    cache.put(keys[2], b"x" * 10)
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_rejects_unsafe_keys(tmp_path: Path):
+    with pytest.raises(ValueError, match="Invalid cache key"):
+        RenderCache(tmp_path).get("../etc/passwd")
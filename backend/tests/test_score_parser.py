@@ -0,0 +1,115 @@
+"""譜例解析モジュールのテスト."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from models.harmony_task_model import HarmonyTask, Score, ScoreType
+from services.score_parser import GivenVoice, ScoreParseError, given_voice_of, parse_pitch, parse_score
+
+MUSICXML = """<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="3.1">
+  <part-list>
+    <score-part id="P1"><part-name>Soprano</part-name></score-part>
+    <score-part id="P2"><part-name>Bass</part-name></score-part>
+  </part-list>
+  <part id="P1">
+    <measure number="1">
+      <attributes><divisions>2</divisions><key><fifths>-1</fifths><mode>minor</mode></key></attributes>
+      <note><pitch><step>A</step><octave>4</octave></pitch><duration>2</duration></note>
+      <note><rest/><duration>2</duration></note>
+      <note><pitch><step>B</step><alter>-1</alter><octave>4</octave></pitch><duration>4</duration></note>
+      <note><chord/><pitch><step>D</step><octave>5</octave></pitch><duration>4</duration></note>
+    </measure>
+  </part>
+  <part id="P2">
+    <measure number="1">
+      <attributes><divisions>1</divisions></attributes>
+      <note><pitch><step>D</step><octave>3</octave></pitch><duration>4</duration></note>
+    </measure>
+  </part>
+</score-partwise>
+"""
+
+
+def test_parse_pitch():
+    assert parse_pitch("C4") == 60
+    assert parse_pitch("C#4") == 61
+    assert parse_pitch("Bb3") == 58
+    assert parse_pitch(45) == 45
+    with pytest.raises(ScoreParseError):
+        parse_pitch("H2")
+
+
+def test_parse_inline_musicxml():
+    parsed = parse_score(Score(type=ScoreType.musicxml, data=MUSICXML))
+    assert parsed.key_fifths == -1
+    assert parsed.mode == "minor"
+    assert [note.pitch for note in parsed.parts[0].notes] == [69, None, 70]
+    assert [note.duration for note in parsed.parts[0].notes] == [1.0, 1.0, 2.0]
+    assert parsed.given_line(GivenVoice.bass) == (50,)
+    assert parsed.given_line(GivenVoice.soprano) == (69, 70)
+
+
+def test_parse_json_score_from_file(tmp_path: Path):
+    score_file = tmp_path / "scores" / "bass.json"
+    score_file.parent.mkdir()
+    score_file.write_text(
+        json.dumps({"key": 0, "functions": ["T", "D", "T"], "notes": ["C3", {"pitch": "G2", "duration": 2}, None]}),
+        encoding="utf-8",
+    )
+    parsed = parse_score(Score(type=ScoreType.json, data="scores/bass.json"), tmp_path)
+    assert parsed.functions == ("T", "D", "T")
+    assert parsed.given_line() == (48, 43)
+
+
+def test_parse_unsupported_score():
+    with pytest.raises(ScoreParseError):
+        parse_score(Score(type=ScoreType.image, data="img.png"))
+    with pytest.raises(ScoreParseError):
+        parse_score(Score(type=ScoreType.musicxml, data="missing.musicxml"))
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"notes": [{"pitch": "C3", "duration": "long"}]},
+        {"notes": [{"pitch": "C3", "duration": None}]},
+        {"notes": [{"pitch": "C3", "duration": [1]}]},
+        {"notes": [{"pitch": "C3", "duration": -1}]},
+        {"notes": [{"pitch": "C3", "duration": "nan"}]},
+        {"notes": [{"pitch": "C3", "duration": "inf"}]},
+        {"notes": ["C3"], "functions": 5},
+    ],
+)
+def test_parse_malformed_json_score(data: dict):
+    with pytest.raises(ScoreParseError):
+        parse_score(Score(type=ScoreType.json, data=json.dumps(data)))
+
+
+@pytest.mark.parametrize(
+    "note",
+    [
+        "<pitch><step>H</step><octave>3</octave></pitch><duration>1</duration>",
+        "<pitch><step>C</step><alter>inf</alter><octave>3</octave></pitch><duration>1</duration>",
+        "<pitch><step>C</step><octave>3</octave></pitch><duration>one</duration>",
+        "<pitch><step>C</step><octave>3</octave></pitch><duration>-1</duration>",
+        "<rest/><duration>-4</duration>",
+    ],
+)
+def test_parse_malformed_musicxml_note(note: str):
+    xml = f'<score-partwise><part id="P1"><measure number="1"><note>{note}</note></measure></part></score-partwise>'
+    with pytest.raises(ScoreParseError):
+        parse_score(Score(type=ScoreType.musicxml, data=xml))
+
+
+def test_given_voice_of():
+    task = HarmonyTask(
+        id="1",
+        description="",
+        score=Score(type=ScoreType.json, data="{}"),
+        answer=[{"type": "json", "data": "{}"}],
+        tags=["機能和声", "ソプラノ課題"],
+    )
+    assert given_voice_of(task) == GivenVoice.soprano
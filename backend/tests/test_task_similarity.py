@@ -0,0 +1,187 @@
+"""類似課題推薦の特徴量索引のテスト."""
+
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from models.harmony_task_model import HarmonyTask
+from repositories.harmony_task_repository import HarmonyTaskRepository
+from repositories.json_harmony_task_repository import JsonHarmonyTaskRepository
+from services.catalog_index_cache import CatalogIndexCache
+from services.task_similarity import (
+    FEATURE_DIM,
+    TaskEmbeddingIndex,
+    extract_features,
+    load_or_build_index,
+    save_index,
+)
+
+CADENCE = {"key": 0, "mode": "major", "functions": ["T", "SD", "D", "T"]}
+
+
+@pytest.fixture
+def tasks(make_task: Callable[..., HarmonyTask]) -> list[HarmonyTask]:
+    return [
+        make_task("1", ["C3", "F3", "G3", "C3"], difficulty="easy", tags=["バス課題", "機能和声"], score=CADENCE),
+        make_task("2", ["D3", "G3", "A3", "D3"], difficulty="easy", tags=["バス課題", "機能和声"], score=CADENCE),
+        make_task(
+            "3",
+            ["E5", "D#5", "D5", "C#5", "C5"],
+            difficulty="hard",
+            tags=["ソプラノ課題", "半音階"],
+            score=CADENCE,
+        ),
+        make_task("4", ["C3", "F3", "G3", "C3"], difficulty="normal", tags=["バス課題"], score=CADENCE),
+    ]
+
+
+def test_extract_features_is_normalized(tasks: list[HarmonyTask]):
+    vector = extract_features(tasks[0])
+    assert vector.shape == (FEATURE_DIM,)
+    assert vector.dtype == np.float32
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_similar_ranks_by_cosine(tasks: list[HarmonyTask]):
+    index = TaskEmbeddingIndex.from_tasks(tasks)
+    result = index.similar("1", k=2)
+    assert [similar.task_id for similar in result] == ["2", "4"]
+    assert result[0].score >= result[1].score
+    assert len(index.similar("1", k=10)) == 3
+
+
+def test_upsert_and_remove_keep_matrix_compact(tasks: list[HarmonyTask]):
+    index = TaskEmbeddingIndex.from_tasks(tasks[:2])
+    index.task_saved(tasks[2])
+    index.task_saved(tasks[3])
+    index.task_deleted("1")
+    assert len(index) == 3
+    assert index.matrix.shape == (3, FEATURE_DIM)
+    assert "1" not in index
+    assert [similar.task_id for similar in index.similar("4", k=1)] == ["2"]
+
+
+def test_save_and_load_with_mmap(tasks: list[HarmonyTask], tmp_path: Path):
+    path = tmp_path / "tasks.embeddings.npy"
+    TaskEmbeddingIndex.from_tasks(tasks).save(path, "v1")
+
+    loaded, version = TaskEmbeddingIndex.load(path)
+    assert version == "v1"
+    assert isinstance(loaded.matrix, np.memmap)
+    assert [similar.task_id for similar in loaded.similar("1", k=1)] == ["2"]
+
+    # 差分更新時はメモリへ複製され、保存済みファイルは変更されない
+    loaded.task_deleted("2")
+    assert [similar.task_id for similar in loaded.similar("1", k=1)] == ["4"]
+    assert len(TaskEmbeddingIndex.load(path)[0]) == 4
+
+
+def test_save_replaces_matrix_and_ids_together(tasks: list[HarmonyTask], tmp_path: Path):
+    path = tmp_path / "tasks.embeddings.npy"
+    TaskEmbeddingIndex.from_tasks(tasks[:2]).save(path, "v1")
+    old_meta = (tmp_path / "tasks.embeddings.json").read_text(encoding="utf-8")
+    TaskEmbeddingIndex.from_tasks(tasks[2:]).save(path, "v2")
+
+    # 置き換えた保存の行列は削除され、古いID一覧と新しい行列が組み合わされることはない
+    assert len(list(tmp_path.glob("tasks.embeddings.*.npy"))) == 1
+    (tmp_path / "tasks.embeddings.json").write_text(old_meta, encoding="utf-8")
+    with pytest.raises(FileNotFoundError):
+        TaskEmbeddingIndex.load(path)
+
+
+def test_concurrent_saves_leave_a_consistent_index(tasks: list[HarmonyTask], tmp_path: Path):
+    path = tmp_path / "tasks.embeddings.npy"
+    indexes = [TaskEmbeddingIndex.from_tasks(tasks[i:] + tasks[:i]) for i in range(len(tasks))]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for _ in executor.map(lambda i: indexes[i % 4].save(path, f"v{i % 4}"), range(40)):
+            pass
+
+    loaded, version = TaskEmbeddingIndex.load(path)
+    expected = indexes[int(version[1:])]
+    assert [loaded.matrix[loaded._rows[task.id]].tolist() for task in tasks] == [  # noqa: SLF001
+        expected.matrix[expected._rows[task.id]].tolist()  # noqa: SLF001
+        for task in tasks
+    ]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_cache_applies_repository_changes_incrementally(tasks: list[HarmonyTask], tmp_path: Path):
+    repository = JsonHarmonyTaskRepository(str(tmp_path / "tasks.json"))
+    for task in tasks[:3]:
+        repository.save_task(task)
+
+    builds: list[TaskEmbeddingIndex] = []
+
+    def build(repo: HarmonyTaskRepository) -> TaskEmbeddingIndex:
+        builds.append(load_or_build_index(repo))
+        return builds[-1]
+
+    cache: CatalogIndexCache[TaskEmbeddingIndex] = CatalogIndexCache(build, save_index)
+    cache.attach(repository)
+    assert len(cache.get(repository)) == 3
+    assert (tmp_path / "tasks.embeddings.json").exists()
+
+    repository.save_task(tasks[3])
+    repository.delete_task("2")
+    index = cache.get(repository)
+    assert len(builds) == 1
+    assert [similar.task_id for similar in index.similar("1", k=1)] == ["4"]
+
+    # 差分更新した索引は保存され、別のプロセスは構築し直さずに読み込める
+    loaded, version = TaskEmbeddingIndex.load(tmp_path / "tasks.embeddings.npy")
+    assert version == repository.catalog_version()
+    assert len(loaded) == 3
+    assert "2" not in loaded
+
+
+def test_cache_rebuilds_after_change_by_another_process(tasks: list[HarmonyTask], tmp_path: Path):
+    repository = JsonHarmonyTaskRepository(str(tmp_path / "tasks.json"))
+    for task in tasks[:2]:
+        repository.save_task(task)
+    cache: CatalogIndexCache[TaskEmbeddingIndex] = CatalogIndexCache(
+        lambda repo: TaskEmbeddingIndex.from_tasks(repo.load_tasks()),
+    )
+    cache.attach(repository)
+    assert len(cache.get(repository)) == 2
+
+    # キャッシュを登録していない別のワーカーが保存した後に、このワーカーが保存する
+    JsonHarmonyTaskRepository(str(tmp_path / "tasks.json")).save_task(tasks[2])
+    repository.save_task(tasks[3])
+
+    index = cache.get(repository)
+    assert len(index) == 4
+    assert "3" in index
+
+
+def test_cache_rebuilds_after_change_between_write_and_notification(tasks: list[HarmonyTask], tmp_path: Path):
+    repository = JsonHarmonyTaskRepository(str(tmp_path / "tasks.json"))
+    for task in tasks[:2]:
+        repository.save_task(task)
+    other_worker = JsonHarmonyTaskRepository(str(tmp_path / "tasks.json"))
+
+    class OtherWorkerWrites:
+        """書き込みの排他制御を解放した直後に、別のワーカーが保存する状況を再現する."""
+
+        def task_saved(self, task: HarmonyTask, previous_version: str | None, version: str | None) -> None:  # noqa: ARG002
+            if task.id == "3":
+                other_worker.save_task(tasks[3])
+
+        def task_deleted(self, task_id: str, previous_version: str | None, version: str | None) -> None:
+            pass
+
+    repository.add_listener(OtherWorkerWrites())
+    cache: CatalogIndexCache[TaskEmbeddingIndex] = CatalogIndexCache(
+        lambda repo: TaskEmbeddingIndex.from_tasks(repo.load_tasks()),
+    )
+    cache.attach(repository)
+    assert len(cache.get(repository)) == 2
+
+    repository.save_task(tasks[2])
+
+    index = cache.get(repository)
+    assert len(index) == 4
+    assert "4" in index
@@ -1,6 +1,8 @@
 """Tasksルーターのテスト."""
 
+import asyncio
 import json
+import shutil
 import tempfile
 from collections.abc import Generator
 from pathlib import Path
@@ -9,7 +11,9 @@ import pytest
 from fastapi.testclient import TestClient
 
 from main import app
-from routes.tasks import get_repository
+from repositories.json_harmony_task_repository import JsonHarmonyTaskRepository
+from repositories.preloaded_harmony_task_repository import PreloadedHarmonyTaskRepository
+from routes.tasks import get_repository, task_change_events
 
 
 @pytest.fixture
@@ -33,17 +37,41 @@ def temp_json_path() -> Generator[str, None, None]:
                     "difficulty": "normal",
                     "tags": ["バッハコラール", "バス課題"],
                 },
+                {
+                    "id": "2",
+                    "title": "下行半音階バス",
+                    "description": "ラメントバスによるバス課題",
+                    "score": {"type": "json", "data": json.dumps({"notes": ["D3", "C#3", "C3", "B2", "Bb2", "A2"]})},
+                    "answer": [{"type": "json", "data": "{}"}],
+                    "difficulty": "hard",
+                    "tags": ["バス課題"],
+                },
+                {
+                    "id": "3",
+                    "title": "ハ長調 ソプラノ課題",
+                    "description": "与えられたソプラノ旋律に対して、下三声を完成させてください。",
+                    "score": {"type": "json", "data": json.dumps({"key": 0, "notes": ["E5", "D5", "C5", "B4", "C5"]})},
+                    "answer": [{"type": "json", "data": "{}"}],
+                    "difficulty": "easy",
+                    "tags": ["ソプラノ課題"],
+                },
             ],
             "metadata": {
                 "version": "1.0",
                 "lastUpdated": "2025-06-16T10:00:00",
-                "totalTasks": 1,
+                "totalTasks": 3,
             },
         }
         json.dump(data, tmp, ensure_ascii=False)
         tmp.flush()  # ファイルに確実に書き込む
         yield tmp.name
     Path(tmp.name).unlink()
+    # 索引などの派生データも削除する
+    for derived in Path(tmp.name).parent.glob(f"{Path(tmp.name).stem}.*"):
+        if derived.is_dir():
+            shutil.rmtree(derived)
+        else:
+            derived.unlink()
 
 
 @pytest.fixture
@@ -57,7 +85,6 @@ def test_client(temp_json_path: str) -> Generator[TestClient, None, None]:
         TestClient: テスト用のFastAPIクライアント
 
     """
-    from repositories.json_harmony_task_repository import JsonHarmonyTaskRepository
 
     def get_test_repository() -> JsonHarmonyTaskRepository:
         return JsonHarmonyTaskRepository(temp_json_path)
@@ -75,7 +102,7 @@ def test_list_tasks(test_client: TestClient) -> None:
     response = test_client.get("/api/tasks")
     assert response.status_code == 200
     tasks = response.json()
-    assert len(tasks) == 1  # テストデータの課題数
+    assert len(tasks) == 3  # テストデータの課題数
     assert tasks[0]["id"] == "1"
     assert tasks[0]["title"] == "バッハコラール バス課題 No.1"
     assert tasks[0]["difficulty"] == "normal"
@@ -95,3 +122,246 @@ def test_get_task_not_found(test_client: TestClient) -> None:
     """存在しない課題の取得テスト."""
     response = test_client.get("/api/tasks/999")
     assert response.status_code == 404
+
+
+def test_batch_get_tasks(test_client: TestClient) -> None:
+    """課題の一括取得テスト."""
+    response = test_client.get("/api/tasks:batchGet", params={"ids": "3,999,1,3"})
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["id"] for item in items] == ["3", "999", "1"]
+    assert items[0]["task"]["difficulty"] == "easy"
+    assert items[0]["error"] is None
+    # 存在しない課題は項目ごとにエラーを返す
+    assert items[1] == {"id": "999", "task": None, "error": "Task not found"}
+    assert items[2]["task"]["title"] == "バッハコラール バス課題 No.1"
+
+
+def test_batch_get_tasks_invalid_record(test_client: TestClient, temp_json_path: str) -> None:
+    """不正なデータを含む課題の一括取得テスト."""
+    path = Path(temp_json_path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["tasks"].append({"id": "4", "description": "不正な課題", "difficulty": "impossible"})
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    response = test_client.get("/api/tasks:batchGet", params={"ids": "4,1"})
+    assert response.status_code == 200
+    items = response.json()
+    # 不正な課題は項目ごとのエラーとして返し、他の課題は取得できる
+    assert items[0] == {"id": "4", "task": None, "error": "Invalid task data"}
+    assert items[1]["task"]["id"] == "1"
+
+
+def test_batch_get_tasks_invalid(test_client: TestClient) -> None:
+    """不正な一括取得指定のテスト."""
+    assert test_client.get("/api/tasks:batchGet").status_code == 422
+    assert test_client.get("/api/tasks:batchGet", params={"ids": ","}).status_code == 400
+    ids = ",".join(str(i) for i in range(101))
+    assert test_client.get("/api/tasks:batchGet", params={"ids": ids}).status_code == 400
+
+
+def test_export_tasks(test_client: TestClient) -> None:
+    """課題一覧のストリーミング出力テスト."""
+    expected = test_client.get("/api/tasks").json()
+
+    response = test_client.get("/api/tasks:export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expected
+
+    response = test_client.get("/api/tasks:export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+    assert test_client.get("/api/tasks:export", params={"format": "xml"}).status_code == 422
+
+
+def test_search_melodic_pattern(test_client: TestClient) -> None:
+    """旋律パターン検索のテスト."""
+    response = test_client.get("/api/tasks/search/melodic", params={"intervals": "-1,-1,-1,-1"})
+    assert response.status_code == 200
+    assert response.json() == [{"task_id": "2", "position": 0}, {"task_id": "2", "position": 1}]
+
+    # 音名で指定した場合も移調に関係なく一致する
+    response = test_client.get("/api/tasks/search/melodic", params={"notes": "G4,F#4,F4,E4,Eb4,D4"})
+    assert response.json() == [{"task_id": "2", "position": 0}]
+
+    # 音度で指定した場合は調号を持つ課題のみが対象となる
+    response = test_client.get("/api/tasks/search/melodic", params={"degrees": "3,2,1"})
+    assert response.json() == [{"task_id": "3", "position": 0}]
+
+
+def test_search_melodic_pattern_invalid(test_client: TestClient) -> None:
+    """不正な旋律パターン指定のテスト."""
+    assert test_client.get("/api/tasks/search/melodic").status_code == 400
+    response = test_client.get("/api/tasks/search/melodic", params={"intervals": "a,b"})
+    assert response.status_code == 400
+    response = test_client.get("/api/tasks/search/melodic", params={"degrees": "8"})
+    assert response.status_code == 400
+    response = test_client.get("/api/tasks/search/melodic", params={"intervals": "-1", "degrees": "1"})
+    assert response.status_code == 400
+
+
+def test_get_similar_tasks(test_client: TestClient) -> None:
+    """類似課題の取得テスト."""
+    response = test_client.get("/api/tasks/1/similar", params={"k": 5})
+    assert response.status_code == 200
+    similar = response.json()
+    assert [item["task_id"] for item in similar] == ["2", "3"]
+    assert 0 < similar[0]["score"] <= 1
+    assert similar[0]["score"] >= similar[1]["score"]
+
+
+def test_get_similar_tasks_not_found(test_client: TestClient) -> None:
+    """存在しない課題の類似課題取得テスト."""
+    assert test_client.get("/api/tasks/999/similar").status_code == 404
+    assert test_client.get("/api/tasks/1/similar", params={"k": 0}).status_code == 422
+
+
+def test_get_realizations(test_client: TestClient) -> None:
+    """実施生成のテスト."""
+    response = test_client.get("/api/tasks/3/realizations", params={"n": 2})
+    assert response.status_code == 200
+    realizations = response.json()
+    assert len(realizations) == 2
+    assert realizations[0]["soprano"] == [76, 74, 72, 71, 72]
+    assert realizations[0]["chords"][-1] == "I"
+    assert realizations[0]["cost"] <= realizations[1]["cost"]
+
+
+def test_get_realizations_errors(test_client: TestClient) -> None:
+    """実施を生成できない場合のテスト."""
+    assert test_client.get("/api/tasks/999/realizations").status_code == 404
+    # 譜例ファイルが存在しない課題
+    assert test_client.get("/api/tasks/1/realizations").status_code == 422
+    # 調の固有和音で和声付けできない半音階的なバス
+    assert test_client.get("/api/tasks/2/realizations").status_code == 422
+
+
+def test_get_score_midi(test_client: TestClient, temp_json_path: str) -> None:
+    """譜例のMIDI取得テスト."""
+    response = test_client.get("/api/tasks/3/score.mid")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/midi"
+    assert response.content.startswith(b"MThd")
+    etag = response.headers["etag"]
+
+    # ディスクにキャッシュされ、同じETagで304が返る
+    cache_dir = Path(temp_json_path).with_suffix(".midi-cache")
+    assert [path.name for path in cache_dir.iterdir()] == [f"{etag.strip(chr(34))}.mid"]
+    response = test_client.get("/api/tasks/3/score.mid", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    # テンポが異なれば別の内容になる
+    response = test_client.get("/api/tasks/3/score.mid", params={"tempo": 120})
+    assert response.headers["etag"] != etag
+
+
+def test_get_answer_midi(test_client: TestClient) -> None:
+    """解答のMIDI取得テスト."""
+    response = test_client.get("/api/tasks/3/answers/0.mid")
+    assert response.status_code == 200
+    assert response.content.startswith(b"MThd")
+    assert test_client.get("/api/tasks/3/answers/1.mid").status_code == 404
+    assert test_client.get("/api/tasks/999/answers/0.mid").status_code == 404
+    # 譜例ファイルが存在しない課題
+    assert test_client.get("/api/tasks/1/answers/0.mid").status_code == 422
+
+
+def test_get_score_midi_with_negative_duration(test_client: TestClient, temp_json_path: str) -> None:
+    """負の音価を含む譜例のMIDI変換が終了し、422を返すテスト."""
+    repository = JsonHarmonyTaskRepository(temp_json_path)
+    task = repository.load_task("3")
+    score = json.dumps({"notes": [{"pitch": "C3", "duration": -1}]})
+    repository.save_task(task.model_copy(update={"score": task.score.model_copy(update={"data": score})}))
+
+    assert test_client.get("/api/tasks/3/score.mid").status_code == 422
+
+
+def test_get_task_changes(test_client: TestClient, temp_json_path: str) -> None:
+    """課題の変更履歴の取得テスト."""
+    assert test_client.get("/api/tasks/changes").json() == []
+
+    repository = JsonHarmonyTaskRepository(temp_json_path)
+    repository.save_task(repository.load_task("3").model_copy(update={"title": "更新後"}))
+    repository.delete_task("2")
+
+    changes = test_client.get("/api/tasks/changes").json()
+    assert [(change["sequence"], change["type"], change["task_id"]) for change in changes] == [
+        (1, "saved", "3"),
+        (2, "deleted", "2"),
+    ]
+    assert changes[0]["task"]["title"] == "更新後"
+    assert changes[1]["task"] is None
+    assert [change["sequence"] for change in test_client.get("/api/tasks/changes?since=1").json()] == [2]
+
+
+def test_task_change_events(temp_json_path: str) -> None:
+    """課題の変更のServer-Sent Events配信テスト."""
+    repository = JsonHarmonyTaskRepository(temp_json_path)
+    repository.save_task(repository.load_task("1"))
+
+    async def collect() -> list[str]:
+        polls = 0
+
+        async def is_disconnected() -> bool:
+            nonlocal polls
+            polls += 1
+            if polls == 2:
+                # 接続中に別のリポジトリインスタンスから削除する
+                JsonHarmonyTaskRepository(temp_json_path).delete_task("2")
+            return polls > 3
+
+        pending = repository.changes_since(0)
+        return [event async for event in task_change_events(repository, 0, pending, is_disconnected, 0)]
+
+    events = asyncio.run(collect())
+    assert [event.split("\n")[:2] for event in events] == [
+        ["id: 1", "event: saved"],
+        ["id: 2", "event: deleted"],
+    ]
+    assert json.loads(events[0].split("data: ")[1])["task"]["id"] == "1"
+
+
+def test_task_change_events_expired(
+    test_client: TestClient,
+    temp_json_path: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """破棄済みの変更履歴を要求した場合のテスト."""
+    monkeypatch.setattr("repositories.json_harmony_task_repository.CHANGE_LOG_LIMIT", 2)
+    repository = JsonHarmonyTaskRepository(temp_json_path)
+    for _ in range(3):
+        repository.save_task(repository.load_task("1"))
+
+    assert test_client.get("/api/tasks/changes?since=0").status_code == 410
+    assert [change["sequence"] for change in test_client.get("/api/tasks/changes?since=1").json()] == [2, 3]
+    assert test_client.get("/api/tasks/events", headers={"Last-Event-ID": "0"}).status_code == 410
+
+    # ファイルが初期化し直されるなどして、通し番号が最後の変更より先になった場合
+    assert test_client.get("/api/tasks/changes?since=4").status_code == 410
+    assert test_client.get("/api/tasks/events", params={"since": 4}).status_code == 410
+
+
+def test_task_change_events_with_preloaded_repository(temp_json_path: str) -> None:
+    """読み込み済みリポジトリでも別のワーカーによる変更が配信されるテスト."""
+    repository = PreloadedHarmonyTaskRepository(JsonHarmonyTaskRepository(temp_json_path))
+
+    async def collect() -> list[str]:
+        polls = 0
+
+        async def is_disconnected() -> bool:
+            nonlocal polls
+            polls += 1
+            if polls == 2:
+                # 別のワーカーが同じファイルに保存する
+                other = JsonHarmonyTaskRepository(temp_json_path)
+                other.save_task(other.load_task("2"))
+            return polls > 3
+
+        return [event async for event in task_change_events(repository, 0, [], is_disconnected, 0)]
+
+    events = asyncio.run(collect())
+    assert [event.split("\n")[:2] for event in events] == [["id: 1", "event: saved"]]